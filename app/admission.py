@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop
+
+from metrics import UPDATES_SHED
+
+# --- Control de admisión ---
+# Se ejecuta antes que cualquier handler y descarta, sin tocar la base de datos:
+#   duplicate     update_id ya procesado dentro de ADMISSION_DUP_WINDOW
+#   collapsed     la misma pulsación (callback o botón de teclado) repetida dentro de ADMISSION_COLLAPSE_WINDOW
+#   rate_limited  el usuario agotó su cubo de tokens (ADMISSION_RATE por segundo, ráfaga ADMISSION_BURST)
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "1"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "5"))
+ADMISSION_DUP_WINDOW = int(os.getenv("ADMISSION_DUP_WINDOW", "600"))
+ADMISSION_COLLAPSE_WINDOW = float(os.getenv("ADMISSION_COLLAPSE_WINDOW", "2"))
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", "50000"))
+ADMISSION_MAX_UPDATES = int(os.getenv("ADMISSION_MAX_UPDATES", "100000"))
+
+class UserBucket:
+    __slots__ = ("tokens", "refilled_at", "payload", "payload_at")
+
+    def __init__(self, now: float):
+        self.tokens = ADMISSION_BURST
+        self.refilled_at = now
+        self.payload = None
+        self.payload_at = 0.0
+
+class AdmissionControl:
+    # Con redis, los update_id vistos se comparten entre réplicas y sobreviven a
+    # un reinicio (Telegram reentrega lo no confirmado); el cubo de tokens y el
+    # colapso de pulsaciones son siempre locales y con tamaño acotado. Del texto
+    # solo se colapsan las etiquetas de teclado (collapse_texts): un mensaje
+    # escrito dos veces (p. ej. en el chat con el especialista) llega siempre.
+    def __init__(self, redis=None, collapse_texts=()):
+        self._redis = redis
+        self._collapse_texts = frozenset(collapse_texts)
+        self._users: OrderedDict[int, UserBucket] = OrderedDict()
+        self._seen: OrderedDict[int, float] = OrderedDict()
+        self.admitted = 0
+        self.shed = {"duplicate": 0, "collapsed": 0, "rate_limited": 0}
+
+    # --- Duplicados ---
+    def _seen_locally(self, update_id: int, now: float) -> bool:
+        while self._seen and (
+            len(self._seen) >= ADMISSION_MAX_UPDATES or next(iter(self._seen.values())) < now - ADMISSION_DUP_WINDOW
+        ):
+            self._seen.popitem(last=False)
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = now
+        return False
+
+    async def _is_duplicate(self, update_id: int, now: float) -> bool:
+        if self._redis is not None:
+            try:
+                return not await self._redis.set(f"shpd-update:{update_id}", 1, nx=True, ex=ADMISSION_DUP_WINDOW)
+            except RedisError as e:
+                logging.error(f"Admisión: no se pudo comprobar el update {update_id} en Redis: {e}")
+        return self._seen_locally(update_id, now)
+
+    # --- Por usuario ---
+    def _bucket(self, user_id: int, now: float) -> UserBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = UserBucket(now)
+            if len(self._users) > ADMISSION_MAX_USERS:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    def _check_user(self, user_id: int, payload: str, now: float):
+        bucket = self._bucket(user_id, now)
+        if payload is not None:
+            repeated = payload == bucket.payload and now - bucket.payload_at < ADMISSION_COLLAPSE_WINDOW
+            bucket.payload = payload
+            bucket.payload_at = now
+            if repeated:
+                return "collapsed"
+        bucket.tokens = min(ADMISSION_BURST, bucket.tokens + (now - bucket.refilled_at) * ADMISSION_RATE)
+        bucket.refilled_at = now
+        if bucket.tokens < 1:
+            return "rate_limited"
+        bucket.tokens -= 1
+        return None
+
+    async def check(self, update) -> str:
+        # Devuelve el motivo del descarte o None si el update pasa
+        now = time.monotonic()
+        if await self._is_duplicate(update.update_id, now):
+            return "duplicate"
+        user = update.effective_user
+        # Las consultas inline llegan con cada tecla y ya se responden con caché
+        if user is None or update.inline_query is not None:
+            return None
+        if update.callback_query is not None:
+            payload = f"cb:{update.callback_query.data}"
+        elif update.message is not None and update.message.text in self._collapse_texts:
+            payload = f"text:{update.message.text}"
+        else:
+            payload = None
+        return self._check_user(user.id, payload, now)
+
+    async def __call__(self, update, context):
+        reason = await self.check(update)
+        if reason is None:
+            self.admitted += 1
+            return
+        self.shed[reason] += 1
+        UPDATES_SHED.labels(reason).inc()
+        # Sin respuesta el botón queda cargando en el cliente
+        if update.callback_query is not None and reason != "duplicate":
+            try:
+                await update.callback_query.answer(
+                    "⏳ Demasiadas peticiones, espera un momento." if reason == "rate_limited" else None
+                )
+            except TelegramError:
+                pass
+        raise ApplicationHandlerStop
+
+    def stats(self) -> dict:
+        return {"admitted": self.admitted, **self.shed, "users": len(self._users)}
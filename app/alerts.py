@@ -0,0 +1,225 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from telegram.error import TelegramError
+
+from models import Paciente
+from db import AsyncSessionLocal
+from redis_client import r
+from ingest import SAMPLES_PREFIX, CLOSE_EVENT, sample_time
+from device_config import DeviceConfigStore
+from metrics import percentile
+
+# --- Configuración del motor de alertas ---
+ALERT_DEFAULT_THRESHOLD = float(os.getenv("ALERT_DEFAULT_THRESHOLD", "30"))
+# Segundos seguidos de buena postura necesarios para cerrar una ventana de mala postura
+ALERT_RESET_SECONDS = float(os.getenv("ALERT_RESET_SECONDS", "3"))
+# Las alertas de un mismo chat dentro de este intervalo se agrupan en un mensaje
+ALERT_COALESCE_SECONDS = float(os.getenv("ALERT_COALESCE_SECONDS", "1"))
+ALERT_SUBSCRIBERS_TTL = float(os.getenv("ALERT_SUBSCRIBERS_TTL", "30"))
+ALERT_DISCOVERY_INTERVAL = float(os.getenv("ALERT_DISCOVERY_INTERVAL", "10"))
+ALERT_SUBSCRIBERS = "shpd-alert-subscribers"
+
+class PostureWindow:
+    __slots__ = ("bad_since", "good_since", "alerted")
+
+    def __init__(self):
+        self.bad_since = None
+        self.good_since = None
+        self.alerted = False
+
+class AlertEngine:
+    # Sigue los streams de muestras de los dispositivos (XREAD, sin consumer
+    # group: cada réplica ve todos los eventos), detecta ventanas sostenidas de
+    # mala postura por encima del umbral de cada dispositivo y avisa al paciente
+    # y a los especialistas suscritos. Un SET NX por ventana evita que dos
+    # réplicas envíen la misma alerta.
+    def __init__(self, bot, redis=r, configs: DeviceConfigStore = None):
+        self._bot = bot
+        self._redis = redis
+        # Umbrales desde la configuración por dispositivo (invalidada por pub/sub si está iniciada)
+        self._configs = configs or DeviceConfigStore(redis)
+        self._streams: dict[str, str] = {}
+        self._windows: dict[str, PostureWindow] = {}
+        # chat_id -> [(device_id, segundos, hora del evento)] pendientes de enviar
+        self._pending: dict[str, list[tuple[str, int, float]]] = {}
+        self._subscribers: tuple[float, set] = (0.0, set())
+        self._last_discovery = 0.0
+        self._tasks: list[asyncio.Task] = []
+        self.latencies = deque(maxlen=10000)
+        self.alerts_fired = 0
+        self.messages_sent = 0
+
+    # --- Umbrales y destinatarios ---
+    async def _threshold(self, device_id: str) -> float:
+        raw = (await self._configs.get(device_id)).get("alert_threshold")
+        return float(raw) if raw else ALERT_DEFAULT_THRESHOLD
+
+    async def _specialists(self) -> set:
+        expires, members = self._subscribers
+        if expires > time.monotonic():
+            return members
+        members = await self._redis.smembers(ALERT_SUBSCRIBERS)
+        self._subscribers = (time.monotonic() + ALERT_SUBSCRIBERS_TTL, members)
+        return members
+
+    # --- Evaluación de ventanas ---
+    async def _fire(self, device_id: str, window: PostureWindow, ts: float, event_time: float):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"shpd-alert:{device_id}:{int(window.bad_since)}", 1, nx=True, ex=3600)
+            pipe.hget(f"shpd-data:{device_id}", "telegram_id")
+            claimed, telegram_id = await pipe.execute()
+        window.alerted = True
+        if not claimed:
+            return
+        self.alerts_fired += 1
+        alert = (device_id, int(ts - window.bad_since), event_time)
+        recipients = set(await self._specialists())
+        if telegram_id:
+            recipients.add(telegram_id)
+        for chat_id in recipients:
+            self._pending.setdefault(chat_id, []).append(alert)
+
+    async def evaluate(self, device_id: str, fields: dict, entry_id: str):
+        if fields.get("evento") == CLOSE_EVENT:
+            self._windows.pop(device_id, None)
+            return
+        # ts del dispositivo acotado a la llegada al stream, como en la ingesta
+        event_time = int(entry_id.split("-")[0]) / 1000
+        ts = sample_time(fields, entry_id)
+        window = self._windows.get(device_id)
+        if window is None:
+            window = self._windows[device_id] = PostureWindow()
+        if fields.get("postura") == "incorrecta":
+            window.good_since = None
+            if window.bad_since is None:
+                window.bad_since = ts
+                window.alerted = False
+            if not window.alerted and ts - window.bad_since >= await self._threshold(device_id):
+                await self._fire(device_id, window, ts, event_time)
+        elif window.bad_since is not None:
+            if window.good_since is None:
+                window.good_since = ts
+            if ts - window.good_since >= ALERT_RESET_SECONDS:
+                window.bad_since = None
+                window.good_since = None
+                window.alerted = False
+
+    # --- Envío agrupado ---
+    async def _patients(self, device_ids: set) -> dict:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Paciente.device_id, Paciente.telegram_id, Paciente.nombre)
+                .where(Paciente.device_id.in_(device_ids))
+            )
+            return {device_id: (telegram_id, nombre) for device_id, telegram_id, nombre in result.all()}
+
+    def _render(self, chat_id: str, items: list, patients: dict) -> str:
+        # Al paciente solo le llega su propia alerta más reciente
+        own = [item for item in items if patients.get(item[0], (None,))[0] == chat_id]
+        if own and len(own) == len(items):
+            return f"⚠️ Llevas {own[-1][1]} s con mala postura. ¡Corrige tu posición!"
+        latest = {}
+        for device_id, seconds, _ in items:
+            latest[device_id] = max(seconds, latest.get(device_id, 0))
+        lines = [
+            f"• {patients.get(device_id, (None, device_id))[1]}: {seconds} s de mala postura"
+            for device_id, seconds in latest.items()
+        ]
+        return "🔔 <b>Alertas de riesgo</b>\n" + "\n".join(lines)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            patients = await self._patients({item[0] for items in pending.values() for item in items})
+        except Exception as e:
+            logging.error(f"Motor de alertas: no se pudieron resolver los pacientes: {e}")
+            patients = {}
+        for chat_id, items in pending.items():
+            text = self._render(chat_id, items, patients)
+            try:
+                await self._bot.send_message(
+                    chat_id=chat_id, text=text, parse_mode="HTML", rate_limit_args={"priority": "alert"}
+                )
+            except TelegramError as e:
+                logging.error(f"No se pudo enviar la alerta a {chat_id}: {e}")
+                continue
+            self.messages_sent += 1
+            now = time.time()
+            self.latencies.extend(now - event_time for _, _, event_time in items)
+
+    # --- Lectura de eventos ---
+    async def _discover(self):
+        first = not self._last_discovery
+        # Streams nuevos: se leen desde el último intervalo de descubrimiento para no perder eventos
+        since = f"{int((time.time() - ALERT_DISCOVERY_INTERVAL) * 1000)}-0"
+        async for key in self._redis.scan_iter(match=f"{SAMPLES_PREFIX}*", count=1000):
+            if key not in self._streams:
+                self._streams[key] = "$" if first else since
+        self._last_discovery = time.monotonic()
+
+    async def _read_loop(self):
+        while True:
+            try:
+                if time.monotonic() - self._last_discovery > ALERT_DISCOVERY_INTERVAL:
+                    await self._discover()
+                if not self._streams:
+                    await asyncio.sleep(1)
+                    continue
+                response = await self._redis.xread(self._streams, count=1000, block=1000)
+                # Configuración de todos los dispositivos del lote en una sola lectura
+                await self._configs.get_many(stream[len(SAMPLES_PREFIX):] for stream, _ in response or [])
+                for stream, entries in response or []:
+                    device_id = stream[len(SAMPLES_PREFIX):]
+                    for entry_id, fields in entries:
+                        try:
+                            await self.evaluate(device_id, fields, entry_id)
+                        except (TypeError, ValueError) as e:
+                            logging.warning(f"Motor de alertas: muestra {entry_id} de {stream} descartada: {e}")
+                    self._streams[stream] = entries[-1][0]
+            except RedisError as e:
+                logging.error(f"Motor de alertas: error de Redis: {e}")
+                await asyncio.sleep(1)
+            except Exception:
+                # Una sola tarea lee todos los dispositivos: no puede morir en silencio
+                logging.exception("Motor de alertas: error inesperado leyendo eventos")
+                await asyncio.sleep(1)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(ALERT_COALESCE_SECONDS)
+            try:
+                await self.flush()
+            except RedisError as e:
+                logging.error(f"Motor de alertas: error de Redis: {e}")
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+        logging.info("Motor de alertas iniciado.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    def latency_percentile(self, p: float) -> float:
+        return percentile(self.latencies, p)
+
+# --- Suscripción de especialistas ---
+async def toggle_subscription(telegram_id: str, redis=r) -> bool:
+    if await redis.sismember(ALERT_SUBSCRIBERS, telegram_id):
+        await redis.srem(ALERT_SUBSCRIBERS, telegram_id)
+        return False
+    await redis.sadd(ALERT_SUBSCRIBERS, telegram_id)
+    return True
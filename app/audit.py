@@ -0,0 +1,155 @@
+import os
+import json
+import uuid
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+from db import AsyncSessionLocal, insert_audit_events
+
+# --- Registro de auditoría ---
+# Los handlers solo añaden el evento a un buffer en memoria (sin round trip); una
+# tarea lo vuelca por lotes en eventos_auditoria. Si Postgres no responde, el
+# lote va a un segmento local (JSON por línea) que se reenvía cuando vuelve.
+# Memoria acotada: con el buffer lleno se vuelca entero a un segmento.
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2"))
+AUDIT_BATCH = int(os.getenv("AUDIT_BATCH", "1000"))
+AUDIT_SEGMENT_DIR = Path(os.getenv("AUDIT_SEGMENT_DIR", "/tmp/shpd-audit"))
+
+class AuditLog:
+    def __init__(self, session_factory=AsyncSessionLocal, segment_dir: Path = AUDIT_SEGMENT_DIR):
+        self._session_factory = session_factory
+        self._segment_dir = segment_dir
+        self._buffer: deque[dict] = deque()
+        self._task: asyncio.Task = None
+        self.recorded = 0
+        self.written = 0
+        self.spilled = 0
+
+    def record(self, accion: str, telegram_id: str, paciente_id: int = None, **detalle):
+        self._buffer.append({
+            "id": uuid.uuid4(),
+            "ocurrido_en": datetime.now(timezone.utc),
+            "telegram_id": str(telegram_id),
+            "paciente_id": paciente_id,
+            "accion": accion,
+            "detalle": detalle or None,
+        })
+        self.recorded += 1
+        if len(self._buffer) >= AUDIT_BUFFER_SIZE:
+            logging.warning(f"Auditoría: buffer lleno, {len(self._buffer)} eventos a un segmento local.")
+            self._spill(self._take(len(self._buffer)))
+
+    def _take(self, count: int) -> list:
+        return [self._buffer.popleft() for _ in range(min(count, len(self._buffer)))]
+
+    # --- Segmentos locales ---
+    def _spill(self, rows: list):
+        # Bloqueante pero raro: solo sin base de datos o con el buffer lleno
+        self._segment_dir.mkdir(parents=True, exist_ok=True)
+        path = self._segment_dir / f"audit-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({
+                    **row, "id": str(row["id"]), "ocurrido_en": row["ocurrido_en"].isoformat(),
+                }) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spilled += len(rows)
+
+    @staticmethod
+    def _load(path: Path) -> list:
+        rows = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            row = json.loads(line)
+            row["id"] = uuid.UUID(row["id"])
+            row["ocurrido_en"] = datetime.fromisoformat(row["ocurrido_en"])
+            rows.append(row)
+        return rows
+
+    async def _replay(self):
+        # Cada segmento se reclama renombrándolo: con varias réplicas o workers
+        # sobre el mismo directorio, solo uno lo reenvía
+        for path in sorted(self._segment_dir.glob("audit-*.jsonl")):
+            claimed = path.with_suffix(f".{os.getpid()}.replay")
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                await self._write(self._load(claimed))
+            except BaseException:
+                claimed.rename(path)
+                raise
+            claimed.unlink()
+            logging.info(f"Auditoría: segmento {path.name} reenviado.")
+
+    # --- Volcado ---
+    async def _write(self, rows: list):
+        async with self._session_factory() as db:
+            await insert_audit_events(db, rows)
+            await db.commit()
+        self.written += len(rows)
+
+    async def flush(self):
+        while self._buffer:
+            rows = self._take(AUDIT_BATCH)
+            try:
+                await self._write(rows)
+            except asyncio.CancelledError:
+                # Parada a mitad de un lote: vuelve al buffer y stop() lo vuelca
+                self._buffer.extendleft(reversed(rows))
+                raise
+            except Exception as e:
+                logging.error(f"Auditoría: no se pudieron guardar {len(rows)} eventos, van a un segmento local: {e}")
+                self._spill(rows + self._take(len(self._buffer)))
+                return
+        if self._segment_dir.exists():
+            try:
+                await self._replay()
+            except Exception as e:
+                logging.error(f"Auditoría: no se pudo reenviar un segmento local, se reintentará: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(AUDIT_FLUSH_INTERVAL)
+            await self.flush()
+
+    def _recover(self):
+        # Segmentos reclamados por un proceso que murió a mitad del reenvío
+        for path in self._segment_dir.glob("audit-*.replay"):
+            pid = int(path.suffixes[-2][1:])
+            # Tras reiniciar un contenedor el pid puede repetirse: el propio no cuenta
+            if pid != os.getpid():
+                try:
+                    os.kill(pid, 0)
+                    continue
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    continue
+            path.rename(path.with_suffix("").with_suffix(".jsonl"))
+
+    def start(self):
+        if self._segment_dir.exists():
+            self._recover()
+        self._task = asyncio.create_task(self._loop())
+        logging.info("Registro de auditoría iniciado.")
+
+    async def stop(self):
+        # Lo pendiente acaba en la base de datos o, si no responde, en un segmento local
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "spilled": self.spilled,
+            "pending": len(self._buffer),
+        }
@@ -0,0 +1,189 @@
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from db import get_paciente_by_telegram_id
+from redis_client import listen_invalidations
+
+# --- Perfil de paciente cacheado ---
+# Cada invalidación se publica en PATIENT_CACHE_CHANNEL para que las demás
+# réplicas descarten su copia en memoria.
+PATIENT_CACHE_CHANNEL = "shpd-patient-changes"
+
+@dataclass(frozen=True)
+class PatientProfile:
+    id: int
+    telegram_id: str
+    device_id: str
+    nombre: str
+    edad: Optional[int]
+    sexo: Optional[str]
+    diagnostico: Optional[str]
+
+    @classmethod
+    def from_model(cls, paciente) -> "PatientProfile":
+        return cls(
+            id=paciente.id,
+            telegram_id=paciente.telegram_id,
+            device_id=paciente.device_id,
+            nombre=paciente.nombre,
+            edad=paciente.edad,
+            sexo=paciente.sexo,
+            diagnostico=paciente.diagnostico,
+        )
+
+class PatientCache:
+    # Cache read-through telegram_id -> PatientProfile: LRU acotado con TTL en
+    # memoria y, opcionalmente, una segunda capa compartida en Redis. notify es
+    # el cliente con el que se avisa a las demás réplicas (por defecto, redis).
+    def __init__(self, session_factory, redis=None, ttl: float = 300, max_size: int = 10000, notify=None):
+        self._session_factory = session_factory
+        self._redis = redis
+        self._notify = notify if notify is not None else redis
+        self._task: asyncio.Task = None
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, PatientProfile]]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _redis_key(telegram_id: str) -> str:
+        return f"shpd-patient:{telegram_id}"
+
+    def _store(self, telegram_id: str, profile: PatientProfile):
+        self._entries[telegram_id] = (time.monotonic() + self._ttl, profile)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, telegram_id: str) -> Optional[PatientProfile]:
+        entry = self._entries.get(telegram_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(telegram_id)
+                self.hits += 1
+                return entry[1]
+            del self._entries[telegram_id]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(telegram_id))
+            except RedisError as e:
+                logging.error(f"Cache de pacientes: error leyendo Redis: {e}")
+                raw = None
+            if raw:
+                profile = PatientProfile(**json.loads(raw))
+                self.redis_hits += 1
+                self._store(telegram_id, profile)
+                return profile
+
+        self.misses += 1
+        async with self._session_factory() as db:
+            paciente = await get_paciente_by_telegram_id(db, telegram_id)
+        # Los "no registrados" no se cachean: el siguiente paso suele ser registrarse
+        if paciente is None:
+            return None
+        profile = PatientProfile.from_model(paciente)
+        self._store(telegram_id, profile)
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._redis_key(telegram_id),
+                    json.dumps(asdict(profile), separators=(",", ":")),
+                    ex=int(self._ttl),
+                )
+            except RedisError as e:
+                logging.error(f"Cache de pacientes: error escribiendo Redis: {e}")
+        return profile
+
+    async def invalidate(self, telegram_id: str):
+        self._entries.pop(telegram_id, None)
+        if self._notify is None:
+            return
+        try:
+            async with self._notify.pipeline(transaction=True) as pipe:
+                if self._redis is not None:
+                    pipe.delete(self._redis_key(telegram_id))
+                pipe.publish(PATIENT_CACHE_CHANNEL, telegram_id)
+                await pipe.execute()
+        except RedisError as e:
+            logging.error(f"Cache de pacientes: error invalidando Redis: {e}")
+
+    def start(self):
+        if self._notify is not None:
+            self._task = asyncio.create_task(listen_invalidations(
+                PATIENT_CACHE_CHANNEL,
+                lambda telegram_id: self._entries.pop(telegram_id, None),
+                self._entries.clear,
+                redis=self._notify,
+                label="Cache de pacientes",
+            ))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+# --- Cache stale-while-revalidate ---
+class StaleWhileRevalidateCache:
+    # Devuelve el valor cacheado mientras sea fresco; si está caducado pero
+    # dentro de stale_ttl lo devuelve igualmente y lo recalcula en segundo plano.
+    def __init__(self, fresh_ttl: float = 60, stale_ttl: float = 900, max_size: int = 10000):
+        self._fresh_ttl = fresh_ttl
+        self._stale_ttl = stale_ttl
+        self._max_size = max_size
+        self._entries: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._refreshing: dict = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def _refresh(self, key, loader):
+        try:
+            self._store(key, await loader())
+        except Exception as e:
+            logging.error(f"Cache SWR: error recalculando {key!r}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get(self, key, loader):
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self._fresh_ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self._stale_ttl:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, loader))
+                return entry[1]
+        self.misses += 1
+        value = await loader()
+        self._store(key, value)
+        return value
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+
+from models import MensajeChat
+from db import AsyncSessionLocal
+from redis_client import r, listen_invalidations
+
+# --- Chat especialista <-> paciente ---
+# Tabla de rutas en Redis: shpd-chat:{telegram_id} -> hash con el otro extremo.
+# Cada réplica la cachea en memoria; al abrir o cerrar una conversación se
+# publica en CHAT_ROUTES_CHANNEL y todas descartan esas entradas.
+CHAT_ROUTES_CHANNEL = "shpd-chat-routes"
+CHAT_TTL = int(os.getenv("CHAT_TTL", str(24 * 3600)))
+CHAT_ROUTE_CACHE_TTL = float(os.getenv("CHAT_ROUTE_CACHE_TTL", "30"))
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "2"))
+CHAT_FLUSH_MAX = int(os.getenv("CHAT_FLUSH_MAX", "500"))
+# Historial retenido en memoria mientras la base de datos no responde
+CHAT_HISTORY_MAX = int(os.getenv("CHAT_HISTORY_MAX", "10000"))
+CHAT_KEY_PREFIX = "shpd-chat:"
+
+# Apertura atómica: comprueba que el paciente no conversa con otro especialista,
+# cierra la conversación anterior del especialista (si la ruta de ese paciente
+# aún apunta a él) y escribe las dos rutas. Devuelve nil si el paciente está
+# ocupado, o el telegram_id del paciente cuya conversación se cerró ('' si ninguna)
+OPEN_CHAT_SCRIPT = """
+local current = redis.call('HGET', KEYS[2], 'peer')
+if current and current ~= ARGV[1] then
+    return nil
+end
+local closed = ''
+local previous = redis.call('HGET', KEYS[1], 'peer')
+if previous and previous ~= ARGV[2] then
+    local previous_key = ARGV[9] .. previous
+    if redis.call('HGET', previous_key, 'peer') == ARGV[1] then
+        redis.call('DEL', previous_key)
+        redis.call('PUBLISH', ARGV[3], previous)
+        closed = previous
+    end
+end
+redis.call('HSET', KEYS[1], 'rol', 'especialista', 'nombre', ARGV[5], 'peer', ARGV[2],
+    'peer_nombre', ARGV[6], 'paciente_id', ARGV[7], 'especialista_id', ARGV[8])
+redis.call('HSET', KEYS[2], 'rol', 'paciente', 'nombre', ARGV[6], 'peer', ARGV[1],
+    'peer_nombre', ARGV[5], 'paciente_id', ARGV[7], 'especialista_id', ARGV[8])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('PUBLISH', ARGV[3], ARGV[1] .. ',' .. ARGV[2])
+return closed
+"""
+
+def route_key(telegram_id: str) -> str:
+    return f"{CHAT_KEY_PREFIX}{telegram_id}"
+
+@dataclass(frozen=True)
+class ChatRoute:
+    rol: str  # rol del dueño de la ruta: "paciente" | "especialista"
+    nombre: str
+    peer: str
+    peer_nombre: str
+    paciente_id: int
+    especialista_id: int
+
+    @classmethod
+    def from_hash(cls, data: dict) -> "ChatRoute":
+        return cls(
+            rol=data["rol"],
+            nombre=data["nombre"],
+            peer=data["peer"],
+            peer_nombre=data["peer_nombre"],
+            paciente_id=int(data["paciente_id"]),
+            especialista_id=int(data["especialista_id"]),
+        )
+
+class ChatRelay:
+    def __init__(self, bot, redis=r, session_factory=AsyncSessionLocal):
+        self._bot = bot
+        self._redis = redis
+        self._session_factory = session_factory
+        self._open_chat = redis.register_script(OPEN_CHAT_SCRIPT)
+        # telegram_id -> (caduca, ruta o None si no está en ninguna conversación)
+        self._routes: dict[str, tuple[float, Optional[ChatRoute]]] = {}
+        self._history: list[dict] = []
+        self._tasks: list[asyncio.Task] = []
+        self.relayed = 0
+        self.route_hits = 0
+        self.route_misses = 0
+
+    # --- Rutas ---
+    async def route(self, telegram_id: str) -> Optional[ChatRoute]:
+        entry = self._routes.get(telegram_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.route_hits += 1
+            return entry[1]
+        self.route_misses += 1
+        data = await self._redis.hgetall(route_key(telegram_id))
+        route = ChatRoute.from_hash(data) if data else None
+        self._routes[telegram_id] = (time.monotonic() + CHAT_ROUTE_CACHE_TTL, route)
+        return route
+
+    async def open(self, especialista, paciente) -> bool:
+        # Devuelve False si el paciente ya conversa con otro especialista. Si el
+        # especialista conversaba con otro paciente, esa conversación se cierra en
+        # el mismo script: si no, los mensajes de ese paciente le seguirían llegando
+        closed = await self._open_chat(
+            keys=[route_key(especialista.telegram_id), route_key(paciente.telegram_id)],
+            args=[
+                especialista.telegram_id, paciente.telegram_id, CHAT_ROUTES_CHANNEL, CHAT_TTL,
+                especialista.nombre, paciente.nombre, paciente.id, especialista.id, CHAT_KEY_PREFIX,
+            ],
+        )
+        if closed is None:
+            return False
+        self._drop(especialista.telegram_id, paciente.telegram_id)
+        if closed:
+            self._drop(closed)
+            await self._bot.send_message(
+                chat_id=closed, text=f"💬 {especialista.nombre} ha finalizado el chat."
+            )
+        return True
+
+    async def close(self, telegram_id: str) -> Optional[ChatRoute]:
+        route = await self.route(telegram_id)
+        if route is None:
+            return None
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(route_key(telegram_id), route_key(route.peer))
+            pipe.publish(CHAT_ROUTES_CHANNEL, f"{telegram_id},{route.peer}")
+            await pipe.execute()
+        self._drop(telegram_id, route.peer)
+        return route
+
+    def _drop(self, *telegram_ids: str):
+        for telegram_id in telegram_ids:
+            self._routes.pop(telegram_id, None)
+
+    # --- Reenvío ---
+    async def relay(self, telegram_id: str, text: str) -> bool:
+        # Una consulta de ruta (normalmente en memoria) y un envío por mensaje
+        route = await self.route(telegram_id)
+        if route is None:
+            return False
+        await self._bot.send_message(chat_id=route.peer, text=f"💬 {route.nombre}: {text}")
+        self.relayed += 1
+        self._history.append({
+            "paciente_id": route.paciente_id,
+            "especialista_id": route.especialista_id,
+            "remitente": route.rol,
+            "texto": text,
+            "enviado_en": datetime.now(timezone.utc),
+        })
+        if len(self._history) >= CHAT_FLUSH_MAX:
+            await self.flush()
+        return True
+
+    async def flush(self):
+        if not self._history:
+            return
+        rows, self._history = self._history, []
+        try:
+            async with self._session_factory() as db:
+                await db.execute(insert(MensajeChat), rows)
+                await db.commit()
+        except Exception as e:
+            logging.error(f"Chat: no se pudo guardar el historial ({len(rows)} mensajes), se reintentará: {e}")
+            self._history[:0] = rows
+            excess = len(self._history) - CHAT_HISTORY_MAX
+            if excess > 0:
+                logging.warning(f"Chat: historial en memoria lleno, se descartan los {excess} mensajes más antiguos.")
+                del self._history[:excess]
+
+    # --- Tareas en segundo plano ---
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(CHAT_FLUSH_INTERVAL)
+            await self.flush()
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(listen_invalidations(
+                CHAT_ROUTES_CHANNEL,
+                lambda message: self._drop(*message.split(",")),
+                self._routes.clear,
+                redis=self._redis,
+                label="Chat",
+            )),
+            asyncio.create_task(self._flush_loop()),
+        ]
+        logging.info("Relay de chat iniciado.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "relayed": self.relayed,
+            "route_hits": self.route_hits,
+            "route_misses": self.route_misses,
+            "pending_history": len(self._history),
+        }
@@ -0,0 +1,127 @@
+import os
+import time
+import asyncio
+import logging
+
+from redis_client import r, listen_invalidations
+
+# --- Configuración por dispositivo ---
+# Un hash por dispositivo (umbral de alerta, modo de sesión y lo que venga) con
+# un campo "version" que crece en cada escritura. Cada escritura publica
+# "{device_id}:{version}" en DEVICE_CONFIG_CHANNEL (réplicas del bot) y en el
+# canal propio del dispositivo, que así no tiene que consultar periódicamente.
+DEVICE_CONFIG_CHANNEL = "shpd-config-changes"
+DEVICE_CONFIG_CACHE_TTL = float(os.getenv("DEVICE_CONFIG_CACHE_TTL", "60"))
+LEGACY_THRESHOLD_PREFIX = "alert_threshold:"
+
+# Escritura atómica: campos, versión y notificación en una sola llamada. La
+# función se reutiliza en otros scripts (apertura de sesión, sessions.py)
+SET_CONFIG_LUA = """
+local function set_config(key, channel, device_id, fields)
+    local version = redis.call('HINCRBY', key, 'version', 1)
+    redis.call('HSET', key, unpack(fields))
+    local message = device_id .. ':' .. version
+    redis.call('PUBLISH', channel, message)
+    redis.call('PUBLISH', channel .. ':' .. device_id, message)
+    return version
+end
+"""
+SET_CONFIG_SCRIPT = SET_CONFIG_LUA + """
+return set_config(KEYS[1], ARGV[1], ARGV[2], {unpack(ARGV, 3)})
+"""
+
+def config_args(device_id: str, values: dict) -> list:
+    args = [DEVICE_CONFIG_CHANNEL, device_id]
+    for field, value in values.items():
+        args.extend((field, value))
+    return args
+
+def config_key(device_id: str) -> str:
+    return f"shpd-config:{device_id}"
+
+def device_channel(device_id: str) -> str:
+    # Canal al que se suscribe cada dispositivo
+    return f"{DEVICE_CONFIG_CHANNEL}:{device_id}"
+
+class DeviceConfigStore:
+    def __init__(self, redis=r):
+        self._redis = redis
+        self._set_config = redis.register_script(SET_CONFIG_SCRIPT)
+        # device_id -> (caduca, configuración; {} si el dispositivo no tiene)
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._task: asyncio.Task = None
+        self.hits = 0
+        self.misses = 0
+
+    # --- Lectura ---
+    async def get(self, device_id: str) -> dict:
+        return (await self.get_many([device_id]))[device_id]
+
+    async def get_many(self, device_ids) -> dict:
+        # Lo que no está en memoria se lee con un único pipeline de HGETALL
+        now = time.monotonic()
+        found, missing = {}, []
+        for device_id in dict.fromkeys(device_ids):
+            entry = self._entries.get(device_id)
+            if entry is not None and entry[0] > now:
+                found[device_id] = entry[1]
+            else:
+                missing.append(device_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for device_id in missing:
+                    pipe.hgetall(config_key(device_id))
+                results = await pipe.execute()
+            expires = time.monotonic() + DEVICE_CONFIG_CACHE_TTL
+            for device_id, config in zip(missing, results):
+                self._entries[device_id] = (expires, config)
+                found[device_id] = config
+        return found
+
+    # --- Escritura ---
+    async def set(self, device_id: str, values: dict) -> int:
+        version = await self._set_config(keys=[config_key(device_id)], args=config_args(device_id, values))
+        self._entries.pop(device_id, None)
+        return version
+
+    async def migrate_legacy(self) -> int:
+        # Umbrales guardados como alert_threshold:{device_id} antes de existir el hash
+        migrated = 0
+        async for key in self._redis.scan_iter(match=f"{LEGACY_THRESHOLD_PREFIX}*", count=1000):
+            value = await self._redis.get(key)
+            device_id = key[len(LEGACY_THRESHOLD_PREFIX):]
+            if value is not None and "alert_threshold" not in await self.get(device_id):
+                await self.set(device_id, {"alert_threshold": value})
+            await self._redis.delete(key)
+            migrated += 1
+        if migrated:
+            logging.info(f"Configuración de dispositivos: {migrated} umbrales antiguos migrados.")
+        return migrated
+
+    # --- Invalidación ---
+    def _invalidate(self, message: str):
+        device_id, _, version = message.rpartition(":")
+        entry = self._entries.get(device_id)
+        # Una notificación atrasada no descarta una versión más nueva ya leída
+        if entry is not None and int(entry[1].get("version", 0)) < int(version):
+            del self._entries[device_id]
+
+    def start(self):
+        self._task = asyncio.create_task(listen_invalidations(
+            DEVICE_CONFIG_CHANNEL,
+            self._invalidate,
+            self._entries.clear,
+            redis=self._redis,
+            label="Configuración de dispositivos",
+        ))
+        logging.info("Configuración de dispositivos: suscripción iniciada.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,108 @@
+import os
+import csv
+import codecs
+import uuid
+import logging
+import importlib.util
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+
+from sqlalchemy import select
+
+from models import MetricaPostural, Sesion, Paciente
+from db import engine
+
+# --- Exportación de métricas ---
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+# Por encima de este tamaño el fichero temporal pasa de memoria a disco
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Parquet es opcional; pyarrow solo se importa al exportar en ese formato
+EXPORT_FORMATS = ("csv", "parquet") if importlib.util.find_spec("pyarrow") else ("csv",)
+
+def export_query():
+    return (
+        select(
+            MetricaPostural.id,
+            MetricaPostural.ts,
+            MetricaPostural.sesion_id,
+            Sesion.paciente_id,
+            Paciente.device_id,
+            Sesion.modo,
+            Sesion.intervalo_segundos,
+            MetricaPostural.porcentaje_correcta,
+            MetricaPostural.porcentaje_incorrecta,
+            MetricaPostural.tiempo_sentado,
+            MetricaPostural.tiempo_parado,
+            MetricaPostural.alertas_enviadas,
+        )
+        .join(Sesion, MetricaPostural.sesion_id == Sesion.id)
+        # Las sesiones anteriores a la migración 0002 no tienen paciente
+        .outerjoin(Paciente, Sesion.paciente_id == Paciente.id)
+        .order_by(MetricaPostural.id)
+    )
+
+def _partitions(conn):
+    # Cursor del lado del servidor: nunca hay más de EXPORT_CHUNK_ROWS filas en memoria
+    result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(export_query())
+    return list(result.keys()), result.partitions()
+
+def _normalize(row) -> list:
+    return [str(value) if isinstance(value, uuid.UUID) else value for value in row]
+
+def _write_csv(out, columns, partitions) -> int:
+    # codecs y no io.TextIOWrapper: SpooledTemporaryFile no es un IOBase completo hasta Python 3.11
+    writer = csv.writer(codecs.getwriter("utf-8")(out))
+    writer.writerow(columns)
+    rows = 0
+    for part in partitions:
+        writer.writerows(_normalize(row) for row in part)
+        rows += len(part)
+    return rows
+
+def _write_parquet(out, columns, partitions) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("sesion_id", pa.string()),
+        ("paciente_id", pa.int64()),
+        ("device_id", pa.string()),
+        ("modo", pa.string()),
+        ("intervalo_segundos", pa.int64()),
+        ("porcentaje_correcta", pa.float64()),
+        ("porcentaje_incorrecta", pa.float64()),
+        ("tiempo_sentado", pa.float64()),
+        ("tiempo_parado", pa.float64()),
+        ("alertas_enviadas", pa.int64()),
+    ])
+    rows = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for part in partitions:
+            data = list(zip(*(_normalize(row) for row in part)))
+            writer.write_table(pa.table(
+                {name: list(values) for name, values in zip(columns, data)}, schema=schema
+            ))
+            rows += len(part)
+    return rows
+
+def write_export(fmt: str = "csv"):
+    # Bloqueante: se ejecuta en un hilo con asyncio.to_thread.
+    # Devuelve (fichero temporal posicionado al inicio, nombre, filas).
+    out = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        with engine.connect() as conn:
+            columns, partitions = _partitions(conn)
+            if fmt == "parquet":
+                rows = _write_parquet(out, columns, partitions)
+            else:
+                rows = _write_csv(out, columns, partitions)
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    filename = f"metricas_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+    logging.info(f"Exportación {filename}: {rows} filas.")
+    return out, filename, rows
@@ -0,0 +1,135 @@
+import io
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+from redis.exceptions import RedisError
+from telegram.error import BadRequest
+
+# --- Recursos gráficos ---
+LOGO_PATH = Path(os.getenv("LOGO_PATH", "/app/nexus/logo-blanco.webp"))
+RESIZE_IMAGES = os.getenv("RESIZE_IMAGES", "false").lower() == "true"
+LOGO_MAX_SIZE = int(os.getenv("LOGO_MAX_SIZE", "512"))
+ASSETS_DIR = Path(os.getenv("ASSETS_DIR", "/tmp/shpd-assets"))
+FILE_ID_TTL = int(os.getenv("FILE_ID_TTL", str(30 * 24 * 3600)))
+
+CHART_SIZE = (800, 400)
+CHART_GOOD = (46, 160, 67)
+CHART_BAD = (218, 54, 51)
+CHART_TEXT = (40, 40, 40)
+
+def prepare_logo() -> Path:
+    # Con RESIZE_IMAGES=true el logo se reescala y pasa a PNG una sola vez por
+    # contenido (el nombre incluye su hash); sin él se envía el original.
+    if not LOGO_PATH.exists():
+        return None
+    if not RESIZE_IMAGES:
+        return LOGO_PATH
+    digest = hashlib.sha1(LOGO_PATH.read_bytes()).hexdigest()[:12]
+    target = ASSETS_DIR / f"logo-{LOGO_MAX_SIZE}-{digest}.png"
+    if not target.exists():
+        ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+        with Image.open(LOGO_PATH) as img:
+            img.thumbnail((LOGO_MAX_SIZE, LOGO_MAX_SIZE))
+            img.save(target, "PNG", optimize=True)
+        logging.info(f"Logo preparado en {target}")
+    return target
+
+def render_sessions_chart(points: list) -> bytes:
+    # Bloqueante: se ejecuta con asyncio.to_thread. points = [(etiqueta, % correcta)]
+    width, height = CHART_SIZE
+    img = Image.new("RGB", CHART_SIZE, "white")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    top, bottom, left = 40, height - 40, 40
+    draw.text((left, 12), "% de postura correcta por sesión", fill=CHART_TEXT, font=font)
+    draw.line((left, bottom, width - 20, bottom), fill=CHART_TEXT)
+    slot = (width - left - 20) / max(len(points), 1)
+    bar = slot * 0.6
+    for i, (label, pct) in enumerate(points):
+        x = left + i * slot + (slot - bar) / 2
+        pct = max(0.0, min(100.0, pct or 0.0))
+        y = bottom - (bottom - top) * pct / 100
+        draw.rectangle((x, y, x + bar, bottom), fill=CHART_GOOD if pct >= 50 else CHART_BAD)
+        draw.text((x, y - 14), f"{pct:.0f}%", fill=CHART_TEXT, font=font)
+        draw.text((x, bottom + 6), label, fill=CHART_TEXT, font=font)
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+def chart_key(points: list) -> str:
+    # Mismos datos -> misma imagen -> se reutiliza el file_id ya subido
+    return "chart:" + hashlib.sha1(repr(points).encode()).hexdigest()
+
+class FileIdCache:
+    # clave de imagen -> file_id de Telegram. Tras la primera subida, los envíos
+    # siguientes referencian el file_id en lugar de volver a subir los bytes.
+    def __init__(self, redis=None, max_size: int = 1000):
+        self._redis = redis
+        self._max_size = max_size
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self.uploads = 0
+        self.reused = 0
+
+    async def _get(self, key: str):
+        file_id = self._entries.get(key)
+        if file_id is not None:
+            self._entries.move_to_end(key)
+            return file_id
+        if self._redis is not None:
+            try:
+                file_id = await self._redis.get(f"shpd-file-id:{key}")
+            except RedisError as e:
+                logging.error(f"No se pudo leer el file_id de {key} en Redis: {e}")
+            if file_id is not None:
+                self._remember(key, file_id)
+        return file_id
+
+    def _remember(self, key: str, file_id: str):
+        self._entries[key] = file_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def _store(self, key: str, file_id: str):
+        self._remember(key, file_id)
+        if self._redis is not None:
+            try:
+                await self._redis.set(f"shpd-file-id:{key}", file_id, ex=FILE_ID_TTL)
+            except RedisError as e:
+                logging.error(f"No se pudo guardar el file_id de {key} en Redis: {e}")
+
+    def _forget(self, key: str):
+        self._entries.pop(key, None)
+
+    async def send_photo(self, bot, chat_id, key: str, produce, **kwargs):
+        # produce: corrutina que devuelve los bytes o la ruta de la imagen; solo se llama si no hay file_id
+        file_id = await self._get(key)
+        if file_id is not None:
+            try:
+                message = await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+                self.reused += 1
+                return message
+            except BadRequest as e:
+                # file_id caducado o de otro bot: se vuelve a subir
+                logging.warning(f"file_id de {key} rechazado ({e}); se sube de nuevo.")
+                self._forget(key)
+        photo = await produce()
+        if isinstance(photo, Path):
+            photo = photo.read_bytes()
+        message = await bot.send_photo(chat_id=chat_id, photo=photo, **kwargs)
+        self.uploads += 1
+        if message.photo:
+            await self._store(key, message.photo[-1].file_id)
+        return message
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "uploads": self.uploads, "reused": self.reused}
+
+if __name__ == "__main__":
+    # Permite preparar los recursos en la construcción de la imagen (ver Dockerfile)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    prepare_logo()
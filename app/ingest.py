@@ -0,0 +1,336 @@
+import os
+import math
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import insert, select
+
+from models import MetricaPostural, Sesion
+from db import AsyncSessionLocal, upsert_resumenes, ensure_partitions, load_ingest_offsets, save_ingest_offsets
+from redis_client import r
+
+# --- Configuración de la ingesta ---
+# Cada dispositivo publica sus muestras de postura en un stream propio:
+#   XADD shpd-samples:{device_id} * session_id <uuid> postura correcta|incorrecta
+#        estado sentado|parado dt <segundos> alerta 0|1 [ts <epoch de la muestra>]
+# Al vencer la sesión el planificador añade XADD ... session_id <uuid> evento cierre
+SAMPLES_PREFIX = "shpd-samples:"
+CLOSE_EVENT = "cierre"
+INGEST_GROUP = os.getenv("INGEST_GROUP", "shpd-ingest")
+INGEST_CONSUMER = os.getenv("INGEST_CONSUMER", socket.gethostname())
+INGEST_BATCH = int(os.getenv("INGEST_BATCH", "1000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "5"))
+INGEST_FLUSH_MAX = int(os.getenv("INGEST_FLUSH_MAX", "20000"))
+INGEST_DISCOVERY_INTERVAL = float(os.getenv("INGEST_DISCOVERY_INTERVAL", "10"))
+INGEST_STREAM_MAXLEN = int(os.getenv("INGEST_STREAM_MAXLEN", "10000"))
+INGEST_PARTITION_INTERVAL = float(os.getenv("INGEST_PARTITION_INTERVAL", "3600"))
+# Desfase máximo aceptado entre el ts del dispositivo y la llegada al stream
+INGEST_CLOCK_SKEW = float(os.getenv("INGEST_CLOCK_SKEW", "300"))
+
+def samples_stream(device_id: str) -> str:
+    return f"{SAMPLES_PREFIX}{device_id}"
+
+def _valid_uuid(value: str) -> bool:
+    # Una muestra con un session_id mal formado no debe bloquear el volcado de las demás
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+def stream_id_key(entry_id: str) -> tuple:
+    # Los ids de stream ("ms-seq") no se ordenan bien como texto
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+def sample_time(fields: dict, entry_id: str) -> float:
+    # El ts del dispositivo, acotado a la hora del id del stream: un reloj mal
+    # puesto no manda filas a la partición por defecto ni a otro día del resumen
+    entry_time = int(entry_id.split("-")[0]) / 1000
+    try:
+        ts = float(fields.get("ts", entry_time))
+    except ValueError:
+        return entry_time
+    if not math.isfinite(ts):
+        return entry_time
+    return min(max(ts, entry_time - INGEST_CLOCK_SKEW), entry_time + INGEST_CLOCK_SKEW)
+
+def parse_sample(fields: dict) -> dict:
+    # Campos numéricos ya convertidos; ValueError si la muestra está mal formada
+    dt = float(fields.get("dt", 1))
+    if not math.isfinite(dt) or dt < 0:
+        raise ValueError(f"dt no válido: {dt}")
+    return {**fields, "dt": dt, "alerta": int(fields.get("alerta", 0))}
+
+class SessionAggregate:
+    __slots__ = ("device_id", "correcta", "incorrecta", "sentado", "parado", "alertas", "ts")
+
+    def __init__(self, device_id: str = None):
+        self.device_id = device_id
+        self.correcta = 0.0
+        self.incorrecta = 0.0
+        self.sentado = 0.0
+        self.parado = 0.0
+        self.alertas = 0
+        self.ts = 0.0
+
+    def add(self, fields: dict, ts: float):
+        self.ts = max(self.ts, ts)
+        dt = float(fields.get("dt", 1))
+        if fields.get("postura") == "incorrecta":
+            self.incorrecta += dt
+        else:
+            self.correcta += dt
+        if fields.get("estado") == "parado":
+            self.parado += dt
+        else:
+            self.sentado += dt
+        self.alertas += int(fields.get("alerta", 0))
+
+    def merge(self, other: "SessionAggregate"):
+        self.device_id = self.device_id or other.device_id
+        self.correcta += other.correcta
+        self.incorrecta += other.incorrecta
+        self.sentado += other.sentado
+        self.parado += other.parado
+        self.alertas += other.alertas
+        self.ts = max(self.ts, other.ts)
+
+    def row(self, sesion_id: str) -> dict:
+        total = self.correcta + self.incorrecta
+        return {
+            "sesion_id": uuid.UUID(sesion_id),
+            # Hora de la última muestra de la ventana: decide la partición mensual
+            "ts": datetime.fromtimestamp(self.ts or time.time(), timezone.utc),
+            "porcentaje_correcta": round(self.correcta * 100 / total, 2) if total else 0.0,
+            "porcentaje_incorrecta": round(self.incorrecta * 100 / total, 2) if total else 0.0,
+            "tiempo_sentado": self.sentado,
+            "tiempo_parado": self.parado,
+            "alertas_enviadas": self.alertas,
+        }
+
+class IngestWorker:
+    # Lee las muestras de todos los streams de dispositivos con un consumer
+    # group, agrega en memoria por sesion_id y vuelca cada ventana con un único
+    # INSERT multi-fila. Los mensajes se confirman (XACK) solo tras el commit,
+    # así que una caída los deja pendientes y se reprocesan al reiniciar; el
+    # último id guardado de cada stream (ingesta_offsets, en el mismo commit)
+    # evita sumar dos veces lo que se guardó pero no llegó a confirmarse.
+    def __init__(self, redis=r, session_factory=AsyncSessionLocal):
+        self._redis = redis
+        self._session_factory = session_factory
+        self._streams: dict[str, str] = {}
+        self._aggregates: dict[str, SessionAggregate] = {}
+        # Acumulados por (sesion_id, día de la muestra) para metricas_resumen
+        self._daily: dict[tuple[str, date], SessionAggregate] = {}
+        self._offsets: dict[str, str] = None
+        self._pending_acks: dict[str, list[str]] = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._last_discovery = 0.0
+        self._last_partitions = 0.0
+        self._closing = False
+        self.samples = 0
+        self.rows_written = 0
+
+    async def _discover(self):
+        async for key in self._redis.scan_iter(match=f"{SAMPLES_PREFIX}*", count=1000):
+            if key in self._streams:
+                continue
+            try:
+                await self._redis.xgroup_create(key, INGEST_GROUP, id="0")
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            # Primero se releen los mensajes propios pendientes de una ejecución anterior
+            self._streams[key] = "0"
+        self._last_discovery = time.monotonic()
+
+    async def _load_offsets(self) -> bool:
+        try:
+            async with self._session_factory() as db:
+                self._offsets = await load_ingest_offsets(db, INGEST_CONSUMER)
+            return True
+        except Exception as e:
+            logging.error(f"Ingesta: no se pudieron leer los offsets guardados, se reintentará: {e}")
+            await asyncio.sleep(1)
+            return False
+
+    def _aggregate(self, device_id: str, session_id: str, fields: dict, entry_id: str):
+        # Se valida antes de tocar los acumulados: una muestra mala no deja nada a medias
+        fields = parse_sample(fields)
+        ts = sample_time(fields, entry_id)
+        agg = self._aggregates.get(session_id)
+        if agg is None:
+            agg = self._aggregates[session_id] = SessionAggregate(device_id)
+        agg.add(fields, ts)
+        day = date.fromtimestamp(ts)
+        daily = self._daily.get((session_id, day))
+        if daily is None:
+            daily = self._daily[(session_id, day)] = SessionAggregate(device_id)
+        daily.add(fields, ts)
+
+    def _consume(self, response):
+        for stream, entries in response:
+            if not entries and self._streams.get(stream) == "0":
+                self._streams[stream] = ">"
+                continue
+            # Releyendo pendientes: lo que no pasa del offset ya está en la base de datos
+            committed = self._offsets.get(stream) if self._streams.get(stream) != ">" else None
+            for entry_id, fields in entries:
+                # Un pendiente recortado por XTRIM vuelve sin campos: solo queda confirmarlo
+                fields = fields or {}
+                session_id = fields.get("session_id")
+                if committed is not None and stream_id_key(entry_id) <= stream_id_key(committed):
+                    pass
+                elif fields.get("evento") == CLOSE_EVENT:
+                    # Sesión terminada: su última métrica se vuelca sin esperar a la ventana
+                    self._closing = True
+                elif session_id and _valid_uuid(session_id):
+                    try:
+                        self._aggregate(stream[len(SAMPLES_PREFIX):], session_id, fields, entry_id)
+                    except (TypeError, ValueError) as e:
+                        # Se confirma igualmente: releerla tras un reinicio volvería a fallar
+                        logging.warning(f"Ingesta: muestra {entry_id} de {stream} descartada: {e}")
+                self._pending_acks.setdefault(stream, []).append(entry_id)
+                self._pending_count += 1
+                self.samples += 1
+                if self._streams[stream] != ">":
+                    self._streams[stream] = entry_id
+
+    async def _resumenes(self, db, daily: dict) -> list:
+        # Acumulados del día y de la semana de cada muestra (no del volcado), una
+        # fila por clave: el upsert no puede tocar dos veces la misma. El paciente
+        # sale de la sesión, no del dispositivo: el device_id puede haber cambiado de dueño
+        session_ids = {uuid.UUID(session_id) for session_id, _ in daily}
+        result = await db.execute(
+            select(Sesion.id, Sesion.paciente_id).where(Sesion.id.in_(session_ids))
+        )
+        pacientes = {str(sesion_id): paciente_id for sesion_id, paciente_id in result.all()}
+        totals: dict[tuple, SessionAggregate] = {}
+        for (session_id, day), agg in daily.items():
+            paciente_id = pacientes.get(str(uuid.UUID(session_id)))
+            if paciente_id is None:
+                continue
+            for periodo, inicio in (("dia", day), ("semana", day - timedelta(days=day.weekday()))):
+                totals.setdefault((paciente_id, periodo, inicio), SessionAggregate()).merge(agg)
+        return [
+            {
+                "paciente_id": paciente_id,
+                "periodo": periodo,
+                "inicio": inicio,
+                "segundos_correcta": agg.correcta,
+                "segundos_incorrecta": agg.incorrecta,
+                "tiempo_sentado": agg.sentado,
+                "tiempo_parado": agg.parado,
+                "alertas_enviadas": agg.alertas,
+            }
+            for (paciente_id, periodo, inicio), agg in totals.items()
+        ]
+
+    async def flush(self):
+        if not self._pending_count:
+            self._last_flush = time.monotonic()
+            return
+        aggregates, self._aggregates = self._aggregates, {}
+        daily, self._daily = self._daily, {}
+        acks, self._pending_acks = self._pending_acks, {}
+        rows = [agg.row(session_id) for session_id, agg in aggregates.items()]
+        offsets = {stream: max(ids, key=stream_id_key) for stream, ids in acks.items()}
+        try:
+            async with self._session_factory() as db:
+                if rows:
+                    await db.execute(insert(MetricaPostural), rows)
+                    await upsert_resumenes(db, await self._resumenes(db, daily))
+                await save_ingest_offsets(db, INGEST_CONSUMER, offsets)
+                await db.commit()
+        except Exception as e:
+            logging.error(f"Ingesta: error escribiendo {len(rows)} métricas, se reintentará: {e}")
+            for session_id, agg in aggregates.items():
+                self._aggregates.setdefault(session_id, SessionAggregate(agg.device_id)).merge(agg)
+            for key, agg in daily.items():
+                self._daily.setdefault(key, SessionAggregate(agg.device_id)).merge(agg)
+            for stream, ids in acks.items():
+                self._pending_acks.setdefault(stream, []).extend(ids)
+            self._last_flush = time.monotonic()
+            return
+
+        self._offsets.update(offsets)
+        self.rows_written += len(rows)
+        self._closing = False
+        self._last_flush = time.monotonic()
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for stream, ids in acks.items():
+                    pipe.xack(stream, INGEST_GROUP, *ids)
+                    pipe.xtrim(stream, maxlen=INGEST_STREAM_MAXLEN, approximate=True)
+                await pipe.execute()
+        except RedisError as e:
+            # Ya están en la base de datos: solo falta confirmarlos, en el próximo volcado
+            logging.error(f"Ingesta: no se pudieron confirmar {self._pending_count} mensajes, se reintentará: {e}")
+            for stream, ids in acks.items():
+                self._pending_acks.setdefault(stream, []).extend(ids)
+        self._pending_count = sum(len(ids) for ids in self._pending_acks.values())
+
+    async def _ensure_partitions(self):
+        self._last_partitions = time.monotonic()
+        try:
+            async with self._session_factory() as db:
+                await ensure_partitions(db)
+                await db.commit()
+        except Exception as e:
+            logging.error(f"Ingesta: no se pudieron crear las particiones de métricas: {e}")
+
+    async def run_once(self):
+        if self._offsets is None and not await self._load_offsets():
+            return
+        if time.monotonic() - self._last_partitions > INGEST_PARTITION_INTERVAL:
+            await self._ensure_partitions()
+        if time.monotonic() - self._last_discovery > INGEST_DISCOVERY_INTERVAL:
+            await self._discover()
+        if self._streams:
+            response = await self._redis.xreadgroup(
+                INGEST_GROUP, INGEST_CONSUMER, self._streams, count=INGEST_BATCH, block=1000
+            )
+            self._consume(response or [])
+        else:
+            await asyncio.sleep(1)
+        if (self._pending_count >= INGEST_FLUSH_MAX or self._closing
+                or time.monotonic() - self._last_flush >= INGEST_FLUSH_INTERVAL):
+            await self.flush()
+
+    async def run(self):
+        logging.info(f"Ingesta de métricas iniciada (grupo {INGEST_GROUP}, consumidor {INGEST_CONSUMER}).")
+        try:
+            while True:
+                try:
+                    await self.run_once()
+                except ResponseError as e:
+                    # Stream borrado o recreado: se vuelve a descubrir y crear el grupo
+                    logging.error(f"Ingesta: {e}")
+                    if "NOGROUP" in str(e):
+                        self._streams.clear()
+                        self._last_discovery = 0.0
+                except RedisError as e:
+                    logging.error(f"Ingesta: error de Redis: {e}")
+                    await asyncio.sleep(1)
+                except Exception:
+                    logging.exception("Ingesta: error inesperado, se sigue con el siguiente lote")
+                    await asyncio.sleep(1)
+        finally:
+            await self.flush()
+
+async def main():
+    try:
+        await IngestWorker().run()
+    finally:
+        await r.aclose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main())
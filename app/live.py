@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.error import BadRequest, TelegramError
+
+from redis_client import r
+from ingest import CLOSE_EVENT, samples_stream, SAMPLES_PREFIX, parse_sample
+from sessions import session_key
+
+# --- Modo en vivo ---
+# Un único par de tareas sigue los streams de todos los dispositivos con una
+# sesión en vivo y edita un mensaje de estado por sesión, como mucho una vez
+# cada LIVE_EDIT_INTERVAL segundos y solo si el texto cambia.
+LIVE_EDIT_INTERVAL = float(os.getenv("LIVE_EDIT_INTERVAL", "5"))
+LIVE_TICK = float(os.getenv("LIVE_TICK", "0.5"))
+
+def stop_keyboard(session_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("⏹ Detener", callback_data=f"live:stop:{session_id}")]])
+
+class LiveView:
+    __slots__ = (
+        "chat_id", "message_id", "session_id", "device_id", "deadline",
+        "postura", "estado", "correcta", "incorrecta", "alertas",
+        "finished", "text", "next_edit", "editing",
+    )
+
+    def __init__(self, chat_id, message_id: int, session_id: str, device_id: str, deadline: float):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.session_id = session_id
+        self.device_id = device_id
+        self.deadline = deadline
+        self.postura = None
+        self.estado = None
+        self.correcta = 0.0
+        self.incorrecta = 0.0
+        self.alertas = 0
+        self.finished = False
+        self.text = None
+        self.next_edit = 0.0
+        self.editing = False
+
+    def add(self, fields: dict):
+        # ValueError antes de tocar nada si la muestra está mal formada
+        fields = parse_sample(fields)
+        dt = fields["dt"]
+        self.postura = fields.get("postura", self.postura)
+        self.estado = fields.get("estado", self.estado)
+        if self.postura == "incorrecta":
+            self.incorrecta += dt
+        else:
+            self.correcta += dt
+        self.alertas += fields["alerta"]
+
+    def render(self) -> str:
+        if self.finished:
+            header = "🏁 <b>Sesión finalizada</b>"
+        else:
+            # Minutos, no segundos: el texto cambia menos y se ahorran ediciones
+            remaining = max(0, int((self.deadline - time.time() + 59) // 60))
+            header = f"📡 <b>Sesión en vivo</b> · quedan {remaining} min"
+        total = self.correcta + self.incorrecta
+        if not total:
+            return f"{header}\nEsperando datos del dispositivo…"
+        postura = "✅ correcta" if self.postura != "incorrecta" else "⚠️ incorrecta"
+        estado = "🧍 de pie" if self.estado == "parado" else "🪑 sentado"
+        return (
+            f"{header}\n"
+            f"Postura: {postura}\n"
+            f"Estado: {estado}\n"
+            f"Correcta: {self.correcta * 100 / total:.0f}% · Alertas: {self.alertas}"
+        )
+
+class LiveMonitor:
+    def __init__(self, bot, redis=r):
+        self._bot = bot
+        self._redis = redis
+        self._views: dict[str, LiveView] = {}
+        # stream -> último id leído; device_id -> sesiones en vivo de ese dispositivo
+        self._streams: dict[str, str] = {}
+        self._by_device: dict[str, set] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._edits: set[asyncio.Task] = set()
+        self.edits = 0
+        self.skipped = 0
+
+    async def watch(self, chat_id, session_id: str) -> bool:
+        if session_id in self._views:
+            return True
+        data = await self._redis.hgetall(session_key(session_id))
+        if not data.get("device_id"):
+            return False
+        start_ts = int(data["start_ts"])
+        deadline = start_ts + int(data["intervalo_segundos"])
+        message = await self._bot.send_message(
+            chat_id=chat_id, text="📡 <b>Sesión en vivo</b>\nConectando…",
+            parse_mode="HTML", reply_markup=stop_keyboard(session_id),
+        )
+        view = LiveView(chat_id, message.message_id, session_id, data["device_id"], deadline)
+        self._views[session_id] = view
+        self._by_device.setdefault(view.device_id, set()).add(session_id)
+        # Se lee desde el inicio de la sesión para mostrar sus porcentajes completos
+        self._streams.setdefault(samples_stream(view.device_id), f"{start_ts * 1000}-0")
+        return True
+
+    def unwatch(self, session_id: str):
+        view = self._views.pop(session_id, None)
+        if view is None:
+            return None
+        sessions = self._by_device.get(view.device_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._by_device[view.device_id]
+                self._streams.pop(samples_stream(view.device_id), None)
+        return view
+
+    def _apply(self, device_id: str, fields: dict):
+        session_id = fields.get("session_id")
+        view = self._views.get(session_id)
+        if view is None or view.device_id != device_id:
+            return
+        if fields.get("evento") == CLOSE_EVENT:
+            view.finished = True
+            view.next_edit = 0.0  # el estado final se muestra sin esperar al intervalo
+        else:
+            view.add(fields)
+
+    async def _read_loop(self):
+        while True:
+            try:
+                if not self._streams:
+                    await asyncio.sleep(LIVE_TICK)
+                    continue
+                response = await self._redis.xread(dict(self._streams), count=1000, block=1000)
+                for stream, entries in response or []:
+                    if stream not in self._streams:
+                        continue  # se dejó de seguir mientras se leía
+                    device_id = stream[len(SAMPLES_PREFIX):]
+                    for entry_id, fields in entries:
+                        try:
+                            self._apply(device_id, fields)
+                        except (TypeError, ValueError) as e:
+                            logging.warning(f"Modo en vivo: muestra {entry_id} de {stream} descartada: {e}")
+                    self._streams[stream] = entries[-1][0]
+            except RedisError as e:
+                logging.error(f"Modo en vivo: error de Redis: {e}")
+                await asyncio.sleep(1)
+            except Exception:
+                # Una sola tarea lee para todas las vistas: no puede morir en silencio
+                logging.exception("Modo en vivo: error inesperado leyendo muestras")
+                await asyncio.sleep(1)
+
+    async def _edit(self, view: LiveView):
+        text = view.render()
+        if text == view.text:
+            self.skipped += 1
+            return
+        try:
+            await self._bot.edit_message_text(
+                chat_id=view.chat_id, message_id=view.message_id, text=text, parse_mode="HTML",
+                reply_markup=None if view.finished else stop_keyboard(view.session_id),
+            )
+            self.edits += 1
+        except BadRequest as e:
+            # Mensaje borrado por el usuario: se deja de seguir; "not modified" se ignora
+            if "not modified" not in str(e).lower():
+                logging.warning(f"Modo en vivo: no se puede editar el mensaje de {view.chat_id}: {e}")
+                self.unwatch(view.session_id)
+                return
+        except TelegramError as e:
+            logging.error(f"Modo en vivo: error editando el mensaje de {view.chat_id}: {e}")
+        view.text = text
+
+    async def _edit_view(self, view: LiveView):
+        try:
+            await self._edit(view)
+            if view.finished:
+                self.unwatch(view.session_id)
+        finally:
+            view.editing = False
+
+    async def _edit_loop(self):
+        while True:
+            await asyncio.sleep(LIVE_TICK)
+            now = time.monotonic()
+            for view in self._views.values():
+                # Sin evento de cierre (planificador desactivado): se da por terminada tras el plazo
+                if not view.finished and time.time() > view.deadline + LIVE_EDIT_INTERVAL * 2:
+                    view.finished = True
+            # Una tarea por edición: un chat frenado por la cola de salida (RetryAfter)
+            # no retrasa a los demás; mientras tanto su vista no se vuelve a encolar
+            for view in list(self._views.values()):
+                if view.editing or view.next_edit > now:
+                    continue
+                view.editing = True
+                view.next_edit = now + LIVE_EDIT_INTERVAL
+                task = asyncio.create_task(self._edit_view(view))
+                self._edits.add(task)
+                task.add_done_callback(self._edits.discard)
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._edit_loop()),
+        ]
+        logging.info("Modo en vivo iniciado.")
+
+    async def stop(self):
+        for task in (*self._tasks, *self._edits):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._edits, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"views": len(self._views), "edits": self.edits, "skipped": self.skipped, "in_flight": len(self._edits)}
@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import logging
+import functools
+import importlib.util
+from contextlib import asynccontextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlalchemy import event
+
+# --- Métricas Prometheus ---
+# Puerto propio: el 80 lo ocupa el webhook en modo BOT_MODE=webhook. 0 desactiva el endpoint.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# Perfilado opcional de updates lentos (segundos; 0 lo desactiva). Requiere pyinstrument.
+PROFILE_SLOW_UPDATES = float(os.getenv("PROFILE_SLOW_UPDATES", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILER_AVAILABLE = importlib.util.find_spec("pyinstrument") is not None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HANDLER_SECONDS = Histogram(
+    "shpd_handler_seconds", "Duración de cada handler del bot", ["handler"], buckets=LATENCY_BUCKETS
+)
+HANDLER_ERRORS = Counter("shpd_handler_errors_total", "Excepciones no capturadas por handler", ["handler"])
+SLOW_UPDATES = Counter("shpd_slow_updates_total", "Updates por encima de PROFILE_SLOW_UPDATES", ["handler"])
+DB_QUERY_SECONDS = Histogram(
+    "shpd_db_query_seconds", "Duración de cada sentencia SQL", ["operation"], buckets=LATENCY_BUCKETS
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "shpd_redis_command_seconds", "Duración de cada comando o pipeline de Redis", ["command"], buckets=LATENCY_BUCKETS
+)
+UPDATE_LAG_SECONDS = Histogram(
+    "shpd_update_lag_seconds", "Desde que Telegram recibe el mensaje hasta que empieza a procesarse",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+UPDATES_SHED = Counter("shpd_updates_shed_total", "Updates descartados por el control de admisión", ["reason"])
+UPDATE_QUEUE_DEPTH = Gauge("shpd_update_queue_depth", "Updates recibidos pendientes de despachar")
+
+_profiling = False
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def _sql_operation(statement: str) -> str:
+    parts = statement.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "?"
+
+@asynccontextmanager
+async def track(name: str):
+    global _profiling
+    profiler = None
+    if PROFILE_SLOW_UPDATES and PROFILER_AVAILABLE and not _profiling and random.random() < PROFILE_SAMPLE_RATE:
+        from pyinstrument import Profiler
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        _profiling = True
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        HANDLER_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        HANDLER_SECONDS.labels(name).observe(elapsed)
+        if profiler is not None:
+            profiler.stop()
+            _profiling = False
+        if PROFILE_SLOW_UPDATES and elapsed >= PROFILE_SLOW_UPDATES:
+            SLOW_UPDATES.labels(name).inc()
+            if profiler is not None:
+                logging.warning(f"Update lento en {name} ({elapsed:.3f} s):\n{profiler.output_text(unicode=True)}")
+            else:
+                logging.warning(f"Update lento en {name} ({elapsed:.3f} s)")
+
+def timed(callback, name: str = None):
+    name = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        async with track(name):
+            return await callback(update, context)
+    return wrapper
+
+async def record_update_lag(update, context):
+    # Solo los mensajes traen fecha; los callbacks heredan la del mensaje original
+    if update.message is not None:
+        UPDATE_LAG_SECONDS.observe(max(0.0, time.time() - update.message.date.timestamp()))
+
+def instrument_engine(engine):
+    # Admite tanto Engine como AsyncEngine (los eventos viven en el engine síncrono)
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("query_start")
+        if stack:
+            DB_QUERY_SECONDS.labels(_sql_operation(statement)).observe(time.perf_counter() - stack.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+def instrument_redis(client):
+    # Envuelve la instancia (no la clase) para no medir clientes ajenos al bot
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def timed_execute_command(*args, **options):
+        start = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*a, **kw):
+            start = time.perf_counter()
+            try:
+                return await execute(*a, **kw)
+            finally:
+                REDIS_COMMAND_SECONDS.labels("MULTI" if pipe.is_transaction else "PIPELINE").observe(
+                    time.perf_counter() - start
+                )
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+
+def start_metrics_server(application):
+    UPDATE_QUEUE_DEPTH.set_function(application.update_queue.qsize)
+    if PROFILE_SLOW_UPDATES and not PROFILER_AVAILABLE:
+        logging.warning("PROFILE_SLOW_UPDATES activo pero pyinstrument no está instalado; solo se registran los updates lentos.")
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+        logging.info(f"Métricas Prometheus en el puerto {METRICS_PORT}")
@@ -0,0 +1,40 @@
+import logging
+from pathlib import Path
+
+from sqlalchemy import text
+
+from db import engine
+
+# --- Migraciones versionadas ---
+# Cada fichero NNNN_descripcion.sql de app/migrations se aplica una sola vez,
+# en orden, dentro de una transacción, y queda registrado en schema_version.
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Clave del advisory lock: varias réplicas arrancando a la vez no migran en paralelo
+MIGRATION_LOCK_ID = 727274
+
+def migrations() -> list:
+    return sorted((int(path.name.split("_")[0]), path) for path in MIGRATIONS_DIR.glob("*.sql"))
+
+def migrate(bind=engine) -> int:
+    applied_now = 0
+    with bind.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        ))
+        applied = set(conn.execute(text("SELECT version FROM schema_version")).scalars())
+        for version, path in migrations():
+            if version in applied:
+                continue
+            logging.info(f"Aplicando migración {path.name}")
+            conn.exec_driver_sql(path.read_text(encoding="utf-8"))
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+            applied_now += 1
+    return applied_now
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    count = migrate()
+    logging.info(f"Esquema al día ({count} migraciones aplicadas).")
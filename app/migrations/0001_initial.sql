@@ -0,0 +1,54 @@
+-- Esquema inicial. Usa IF NOT EXISTS para adoptar las bases creadas antes
+-- con Base.metadata.create_all.
+
+CREATE TABLE IF NOT EXISTS pacientes (
+    id SERIAL PRIMARY KEY,
+    telegram_id VARCHAR NOT NULL,
+    device_id VARCHAR NOT NULL,
+    nombre VARCHAR NOT NULL,
+    edad INTEGER,
+    sexo VARCHAR,
+    diagnostico VARCHAR
+);
+CREATE INDEX IF NOT EXISTS ix_pacientes_id ON pacientes (id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_pacientes_telegram_id ON pacientes (telegram_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_pacientes_device_id ON pacientes (device_id);
+CREATE INDEX IF NOT EXISTS ix_pacientes_nombre_id ON pacientes (nombre, id);
+
+CREATE TABLE IF NOT EXISTS especialistas (
+    id SERIAL PRIMARY KEY,
+    telegram_id VARCHAR NOT NULL,
+    nombre VARCHAR NOT NULL,
+    edad INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_especialistas_id ON especialistas (id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_especialistas_telegram_id ON especialistas (telegram_id);
+
+CREATE TABLE IF NOT EXISTS sesiones (
+    id UUID PRIMARY KEY,
+    intervalo_segundos INTEGER,
+    modo VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS metricas_posturales (
+    id SERIAL PRIMARY KEY,
+    sesion_id UUID REFERENCES sesiones (id),
+    porcentaje_correcta DOUBLE PRECISION,
+    porcentaje_incorrecta DOUBLE PRECISION,
+    tiempo_sentado DOUBLE PRECISION,
+    tiempo_parado DOUBLE PRECISION,
+    alertas_enviadas INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_metricas_posturales_id ON metricas_posturales (id);
+
+CREATE TABLE IF NOT EXISTS metricas_resumen (
+    paciente_id INTEGER NOT NULL REFERENCES pacientes (id),
+    periodo VARCHAR NOT NULL,
+    inicio DATE NOT NULL,
+    segundos_correcta DOUBLE PRECISION NOT NULL DEFAULT 0,
+    segundos_incorrecta DOUBLE PRECISION NOT NULL DEFAULT 0,
+    tiempo_sentado DOUBLE PRECISION NOT NULL DEFAULT 0,
+    tiempo_parado DOUBLE PRECISION NOT NULL DEFAULT 0,
+    alertas_enviadas INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (paciente_id, periodo, inicio)
+);
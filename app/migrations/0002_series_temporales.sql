@@ -0,0 +1,66 @@
+-- sesiones: vínculo con el paciente y marcas de inicio/fin.
+-- Las sesiones anteriores quedan sin paciente (solo se conocía vía Redis).
+ALTER TABLE sesiones
+    ADD COLUMN IF NOT EXISTS paciente_id INTEGER REFERENCES pacientes (id),
+    ADD COLUMN IF NOT EXISTS inicio TIMESTAMPTZ NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS fin TIMESTAMPTZ;
+-- "Últimas N sesiones del paciente X"
+CREATE INDEX IF NOT EXISTS ix_sesiones_paciente_inicio ON sesiones (paciente_id, inicio DESC);
+
+-- metricas_posturales pasa a estar particionada por mes sobre ts. Una tabla
+-- no puede convertirse en particionada: se crea de nuevo y se copian las filas.
+ALTER TABLE metricas_posturales RENAME TO metricas_posturales_old;
+ALTER TABLE metricas_posturales_old RENAME CONSTRAINT metricas_posturales_pkey TO metricas_posturales_old_pkey;
+
+CREATE TABLE metricas_posturales (
+    id BIGINT NOT NULL DEFAULT nextval('metricas_posturales_id_seq'),
+    ts TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sesion_id UUID REFERENCES sesiones (id),
+    porcentaje_correcta DOUBLE PRECISION,
+    porcentaje_incorrecta DOUBLE PRECISION,
+    tiempo_sentado DOUBLE PRECISION,
+    tiempo_parado DOUBLE PRECISION,
+    alertas_enviadas INTEGER,
+    -- La clave de partición debe formar parte de la clave primaria
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Red de seguridad: si falta la partición de un mes, las filas no se pierden
+CREATE TABLE metricas_posturales_default PARTITION OF metricas_posturales DEFAULT;
+
+-- Crea (si no existen) las particiones del mes actual y de los `meses` siguientes
+CREATE OR REPLACE FUNCTION shpd_crear_particiones(meses INTEGER) RETURNS void AS $$
+DECLARE
+    desde DATE;
+BEGIN
+    FOR i IN 0..meses LOOP
+        desde := (date_trunc('month', now()) + make_interval(months => i))::date;
+        EXECUTE 'CREATE TABLE IF NOT EXISTS '
+            || quote_ident('metricas_posturales_' || to_char(desde, 'YYYYMM'))
+            || ' PARTITION OF metricas_posturales FOR VALUES FROM ('
+            || quote_literal(desde) || ') TO ('
+            || quote_literal((desde + interval '1 month')::date) || ')';
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT shpd_crear_particiones(2);
+
+-- Las métricas antiguas no tenían marca de tiempo: quedan en el mes de la migración
+INSERT INTO metricas_posturales (
+    id, ts, sesion_id, porcentaje_correcta, porcentaje_incorrecta,
+    tiempo_sentado, tiempo_parado, alertas_enviadas
+)
+SELECT id, now(), sesion_id, porcentaje_correcta, porcentaje_incorrecta,
+       tiempo_sentado, tiempo_parado, alertas_enviadas
+FROM metricas_posturales_old;
+
+-- La secuencia sigue numerando desde donde estaba; se traspasa antes de borrar la tabla vieja
+ALTER SEQUENCE metricas_posturales_id_seq OWNED BY metricas_posturales.id;
+DROP TABLE metricas_posturales_old;
+
+-- Historial de una sesión en orden temporal
+CREATE INDEX ix_metricas_posturales_sesion_ts ON metricas_posturales (sesion_id, ts);
+-- Barridos por rango de fechas (resúmenes de toda la clínica): las filas llegan
+-- en orden de ts, así que un BRIN ocupa unos pocos KB por partición
+CREATE INDEX ix_metricas_posturales_ts_brin ON metricas_posturales USING brin (ts);
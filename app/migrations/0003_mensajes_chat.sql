@@ -0,0 +1,10 @@
+-- Historial del chat especialista <-> paciente, escrito por lotes desde el relay
+CREATE TABLE IF NOT EXISTS mensajes_chat (
+    id BIGSERIAL PRIMARY KEY,
+    paciente_id INTEGER NOT NULL REFERENCES pacientes (id),
+    especialista_id INTEGER NOT NULL REFERENCES especialistas (id),
+    remitente VARCHAR NOT NULL,
+    texto TEXT NOT NULL,
+    enviado_en TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_mensajes_chat_paciente_enviado ON mensajes_chat (paciente_id, enviado_en);
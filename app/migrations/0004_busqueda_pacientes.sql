@@ -0,0 +1,6 @@
+-- Búsqueda aproximada de pacientes (modo inline) por nombre, dispositivo y
+-- diagnóstico. La expresión debe coincidir con search_text() de app/db.py
+-- para que el planificador use el índice.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_pacientes_busqueda_trgm ON pacientes
+    USING gin ((nombre || ' ' || device_id || ' ' || coalesce(diagnostico, '')) gin_trgm_ops);
@@ -0,0 +1,13 @@
+-- Registro de auditoría de acciones clínicas (solo inserciones), escrito por
+-- lotes desde app/audit.py. El id lo genera el bot: reenviar un lote ya
+-- guardado (p. ej. desde un segmento local) no duplica eventos.
+CREATE TABLE IF NOT EXISTS eventos_auditoria (
+    id UUID PRIMARY KEY,
+    ocurrido_en TIMESTAMPTZ NOT NULL,
+    telegram_id VARCHAR NOT NULL,
+    paciente_id INTEGER REFERENCES pacientes (id),
+    accion VARCHAR NOT NULL,
+    detalle JSONB
+);
+CREATE INDEX IF NOT EXISTS ix_eventos_auditoria_paciente_ocurrido
+    ON eventos_auditoria (paciente_id, ocurrido_en DESC);
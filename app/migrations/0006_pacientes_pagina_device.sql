@@ -0,0 +1,5 @@
+-- La lista paginada de pacientes también lee device_id (configuración de cada
+-- dispositivo de la página): el índice keyset lo incluye para seguir
+-- resolviendo cada página con un index-only scan.
+DROP INDEX IF EXISTS ix_pacientes_nombre_id;
+CREATE INDEX IF NOT EXISTS ix_pacientes_nombre_id ON pacientes (nombre, id) INCLUDE (device_id);
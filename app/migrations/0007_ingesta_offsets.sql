@@ -0,0 +1,9 @@
+-- Último mensaje de cada stream ya guardado por cada consumidor de la ingesta,
+-- escrito en la misma transacción que las métricas. Al releer los pendientes
+-- tras una caída, lo que no pasa de aquí ya está sumado y solo se confirma.
+CREATE TABLE IF NOT EXISTS ingesta_offsets (
+    consumidor VARCHAR NOT NULL,
+    stream VARCHAR NOT NULL,
+    ultimo_id VARCHAR NOT NULL,
+    PRIMARY KEY (consumidor, stream)
+);
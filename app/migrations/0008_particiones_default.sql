@@ -0,0 +1,34 @@
+-- shpd_crear_particiones fallaba en cuanto la partición DEFAULT tenía filas del
+-- mes a crear (ingesta con la creación de particiones caída, o muestras con ts
+-- adelantado): CREATE TABLE ... PARTITION OF rechaza la operación si la DEFAULT
+-- ya contiene filas de ese rango. Ahora la partición se crea suelta, se le
+-- mueven esas filas y después se adjunta.
+--
+-- Recuperación: una instalación en la que la función ya estaba fallando no
+-- necesita nada más que esta migración; la siguiente llamada (ingesta cada
+-- INGEST_PARTITION_INTERVAL, o a mano con SELECT shpd_crear_particiones(2))
+-- crea los meses que faltan y vacía de ellos la DEFAULT.
+CREATE OR REPLACE FUNCTION shpd_crear_particiones(meses INTEGER) RETURNS void AS $$
+DECLARE
+    desde DATE;
+    hasta DATE;
+    nombre TEXT;
+BEGIN
+    FOR i IN 0..meses LOOP
+        desde := (date_trunc('month', now()) + make_interval(months => i))::date;
+        hasta := (desde + interval '1 month')::date;
+        nombre := 'metricas_posturales_' || to_char(desde, 'YYYYMM');
+        CONTINUE WHEN to_regclass(quote_ident(nombre)) IS NOT NULL;
+        -- Bloquea la DEFAULT hasta el final de la transacción: una inserción
+        -- concurrente del mismo mes haría fallar el ATTACH
+        LOCK TABLE metricas_posturales_default IN ACCESS EXCLUSIVE MODE;
+        EXECUTE 'CREATE TABLE ' || quote_ident(nombre) || ' (LIKE metricas_posturales INCLUDING DEFAULTS)';
+        EXECUTE 'WITH movidas AS (DELETE FROM metricas_posturales_default WHERE ts >= '
+            || quote_literal(desde) || ' AND ts < ' || quote_literal(hasta)
+            || ' RETURNING *) INSERT INTO ' || quote_ident(nombre) || ' SELECT * FROM movidas';
+        -- Índices, clave primaria y clave foránea se heredan al adjuntar
+        EXECUTE 'ALTER TABLE metricas_posturales ATTACH PARTITION ' || quote_ident(nombre)
+            || ' FOR VALUES FROM (' || quote_literal(desde) || ') TO (' || quote_literal(hasta) || ')';
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,117 @@
+import uuid
+
+from sqlalchemy import Column, Integer, String, Text, Float, Date, DateTime, ForeignKey, Index, JSON, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.ext.declarative import declarative_base
+
+# Solo definiciones: importar este módulo no abre conexiones.
+# El esquema se crea y actualiza con las migraciones de app/migrations (app/migrate.py).
+Base = declarative_base()
+
+# --- Modelos ---
+class Paciente(Base):
+    __tablename__ = "pacientes"
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(String, unique=True, index=True, nullable=False)
+    device_id = Column(String, unique=True, index=True, nullable=False)
+    nombre = Column(String, nullable=False)
+    edad = Column(Integer)
+    sexo = Column(String)
+    diagnostico = Column(String)
+    __table_args__ = (
+        # Paginación keyset de la lista de pacientes (ORDER BY nombre, id); device_id
+        # incluido para que la página se resuelva solo con el índice (migración 0006)
+        Index("ix_pacientes_nombre_id", "nombre", "id", postgresql_include=["device_id"]),
+    )
+
+class Especialista(Base):
+    __tablename__ = "especialistas"
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(String, unique=True, index=True, nullable=False)
+    nombre = Column(String, nullable=False)
+    edad = Column(Integer)
+    __table_args__ = (
+        {'sqlite_autoincrement': True},
+    )
+
+class Sesion(Base):
+    __tablename__ = "sesiones"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    paciente_id = Column(Integer, ForeignKey("pacientes.id"))
+    intervalo_segundos = Column(Integer)
+    modo = Column(String)
+    inicio = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    fin = Column(DateTime(timezone=True))
+    __table_args__ = (
+        Index("ix_sesiones_paciente_inicio", paciente_id, inicio.desc()),
+    )
+
+class MetricaPostural(Base):
+    # En Postgres la tabla está particionada por mes sobre ts y su clave primaria
+    # es (id, ts) (migración 0002); para el ORM basta con id, que es único.
+    __tablename__ = "metricas_posturales"
+    id = Column(Integer, primary_key=True)
+    ts = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sesion_id = Column(UUID, ForeignKey("sesiones.id"))
+    porcentaje_correcta = Column(Float)
+    porcentaje_incorrecta = Column(Float)
+    tiempo_sentado = Column(Float)
+    tiempo_parado = Column(Float)
+    alertas_enviadas = Column(Integer)
+    __table_args__ = (
+        Index("ix_metricas_posturales_sesion_ts", "sesion_id", "ts"),
+        Index("ix_metricas_posturales_ts_brin", "ts", postgresql_using="brin"),
+    )
+
+class MensajeChat(Base):
+    # Historial del chat especialista <-> paciente (migración 0003)
+    __tablename__ = "mensajes_chat"
+    id = Column(Integer, primary_key=True)
+    paciente_id = Column(Integer, ForeignKey("pacientes.id"), nullable=False)
+    especialista_id = Column(Integer, ForeignKey("especialistas.id"), nullable=False)
+    remitente = Column(String, nullable=False)  # "paciente" | "especialista"
+    texto = Column(Text, nullable=False)
+    enviado_en = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    __table_args__ = (
+        Index("ix_mensajes_chat_paciente_enviado", "paciente_id", "enviado_en"),
+    )
+
+class EventoAuditoria(Base):
+    # Registro de auditoría de acciones clínicas, solo inserciones (migración 0005)
+    __tablename__ = "eventos_auditoria"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    ocurrido_en = Column(DateTime(timezone=True), nullable=False)
+    telegram_id = Column(String, nullable=False)
+    paciente_id = Column(Integer, ForeignKey("pacientes.id"))
+    accion = Column(String, nullable=False)
+    detalle = Column(JSON().with_variant(JSONB(), "postgresql"))
+    __table_args__ = (
+        Index("ix_eventos_auditoria_paciente_ocurrido", paciente_id, ocurrido_en.desc()),
+    )
+
+class MetricaResumen(Base):
+    # Acumulados diarios y semanales por paciente, actualizados por la ingesta
+    __tablename__ = "metricas_resumen"
+    paciente_id = Column(Integer, ForeignKey("pacientes.id"), primary_key=True)
+    periodo = Column(String, primary_key=True)  # "dia" | "semana"
+    inicio = Column(Date, primary_key=True)
+    segundos_correcta = Column(Float, nullable=False, default=0)
+    segundos_incorrecta = Column(Float, nullable=False, default=0)
+    tiempo_sentado = Column(Float, nullable=False, default=0)
+    tiempo_parado = Column(Float, nullable=False, default=0)
+    alertas_enviadas = Column(Integer, nullable=False, default=0)
+
+class IngestaOffset(Base):
+    # Último id de stream guardado por cada consumidor de la ingesta (migración 0007)
+    __tablename__ = "ingesta_offsets"
+    consumidor = Column(String, primary_key=True)
+    stream = Column(String, primary_key=True)
+    ultimo_id = Column(String, nullable=False)
+
+RESUMEN_SUMS = (
+    "segundos_correcta",
+    "segundos_incorrecta",
+    "tiempo_sentado",
+    "tiempo_parado",
+    "alertas_enviadas",
+)
@@ -0,0 +1,253 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import OrderedDict, deque
+
+from telegram.error import RetryAfter, NetworkError, TimedOut
+from telegram.ext import BaseRateLimiter
+
+from metrics import percentile
+
+# --- Cola de salida hacia la Bot API ---
+# Prioridades: rate_limit_args={"priority": "alert"} pasa al carril de alertas
+LANE_ALERT = 0
+LANE_NORMAL = 1
+
+def _is_rate_limited(endpoint: str) -> bool:
+    # Solo los métodos que envían o editan mensajes cuentan para los límites de Telegram
+    return endpoint.startswith(("send", "edit", "copy", "forward"))
+
+def _seconds(retry_after) -> float:
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class _Request:
+    __slots__ = ("lane", "seq", "callback", "args", "kwargs", "future", "enqueued", "attempts")
+
+    def __init__(self, lane, seq, callback, args, kwargs, future):
+        self.lane = lane
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+class _ChatQueue:
+    __slots__ = ("lanes", "bucket", "in_flight", "ready_at")
+
+    def __init__(self, bucket: TokenBucket):
+        self.lanes = (deque(), deque())
+        self.bucket = bucket
+        self.in_flight = False
+        self.ready_at = 0.0
+
+    def head(self):
+        for lane in self.lanes:
+            if lane:
+                return lane[0]
+        return None
+
+    def pop(self) -> _Request:
+        for lane in self.lanes:
+            if lane:
+                return lane.popleft()
+
+class OutboxRateLimiter(BaseRateLimiter):
+    # Todas las llamadas de envío del bot pasan por aquí: cola FIFO por chat con
+    # carril prioritario para alertas, token bucket global y por chat, reintento
+    # tras RetryAfter y cola acotada (los handlers esperan si está llena).
+    # Un chat nunca tiene más de un envío en curso, así se conserva el orden.
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 max_queue: int = 10000, workers: int = 8, max_retries: int = 3, max_chats: int = 100000):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_queue = max_queue
+        self._workers_count = workers
+        self._max_retries = max_retries
+        self._chats: dict = {}
+        # Los cubos por chat sobreviven a su cola: si no, cada envío tras vaciarla
+        # empezaría con la ráfaga completa. LRU acotado; el más antiguo ya está lleno
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._max_chats = max_chats
+        self._ready: list = []
+        self._delayed: list = []
+        self._seq = itertools.count()
+        self._space = None
+        self._wakeup = None
+        self._workers: list[asyncio.Task] = []
+        self.depth = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=10000)
+
+    async def initialize(self):
+        self._space = asyncio.Semaphore(self._max_queue)
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+
+    async def shutdown(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for chat in self._chats.values():
+            for lane in chat.lanes:
+                for request in lane:
+                    if not request.future.done():
+                        request.future.set_exception(RuntimeError("Cola de salida detenida"))
+        self._chats.clear()
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+            while len(self._buckets) > self._max_chats:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    # --- Planificación ---
+    def _schedule(self, chat_id):
+        chat = self._chats[chat_id]
+        head = chat.head()
+        if head is None or chat.in_flight:
+            return
+        if chat.ready_at > time.monotonic():
+            heapq.heappush(self._delayed, (chat.ready_at, chat_id))
+        else:
+            heapq.heappush(self._ready, (head.lane, head.seq, chat_id))
+        self._wakeup.set()
+
+    async def _next(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, chat_id = heapq.heappop(self._delayed)
+                if chat_id in self._chats:
+                    self._schedule(chat_id)
+            while self._ready:
+                _, _, chat_id = heapq.heappop(self._ready)
+                chat = self._chats.get(chat_id)
+                # Entradas duplicadas u obsoletas del heap se descartan aquí
+                if chat is None or chat.in_flight or chat.head() is None:
+                    continue
+                delay = chat.bucket.delay(now)
+                if delay > 0:
+                    chat.ready_at = now + delay
+                    heapq.heappush(self._delayed, (chat.ready_at, chat_id))
+                    continue
+                chat.bucket.take()
+                chat.in_flight = True
+                return chat_id, chat, chat.pop()
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            chat_id, chat, request = await self._next()
+            delay = self._global.delay(time.monotonic())
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._global.delay(time.monotonic())
+            self._global.take()
+            requeue = False
+            try:
+                result = await request.callback(*request.args, **request.kwargs)
+            except RetryAfter as e:
+                request.attempts += 1
+                self.retried += 1
+                if request.attempts > self._max_retries:
+                    self._fail(request, e)
+                else:
+                    logging.warning(f"Telegram pide esperar {e.retry_after} s en el chat {chat_id}.")
+                    chat.ready_at = time.monotonic() + _seconds(e.retry_after)
+                    requeue = True
+            except (TimedOut, NetworkError) as e:
+                request.attempts += 1
+                self.retried += 1
+                if request.attempts > self._max_retries:
+                    self._fail(request, e)
+                else:
+                    chat.ready_at = time.monotonic() + 0.5 * 2 ** request.attempts
+                    requeue = True
+            except Exception as e:
+                self._fail(request, e)
+            else:
+                self.sent += 1
+                self.latencies.append(time.monotonic() - request.enqueued)
+                if not request.future.done():
+                    request.future.set_result(result)
+            finally:
+                chat.in_flight = False
+                if requeue:
+                    chat.lanes[request.lane].appendleft(request)
+                if chat.head() is None:
+                    # Solo la cola vacía: el cubo del chat sigue en self._buckets
+                    del self._chats[chat_id]
+                else:
+                    self._schedule(chat_id)
+
+    def _fail(self, request: _Request, error: Exception):
+        self.failed += 1
+        if not request.future.done():
+            request.future.set_exception(error)
+
+    # --- Interfaz de BaseRateLimiter ---
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if not _is_rate_limited(endpoint):
+            return await callback(*args, **kwargs)
+
+        chat_id = str(data.get("chat_id") or data.get("inline_message_id"))
+        lane = LANE_ALERT if (rate_limit_args or {}).get("priority") == "alert" else LANE_NORMAL
+        await self._space.acquire()
+        self.depth += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _ChatQueue(self._bucket(chat_id))
+            chat.lanes[lane].append(_Request(lane, next(self._seq), callback, args, kwargs, future))
+            self._schedule(chat_id)
+            return await future
+        finally:
+            self.depth -= 1
+            self._space.release()
+
+    def latency_percentile(self, p: float) -> float:
+        return percentile(self.latencies, p)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "p50_ms": round(self.latency_percentile(0.5) * 1000, 1),
+            "p99_ms": round(self.latency_percentile(0.99) * 1000, 1),
+        }
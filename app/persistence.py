@@ -0,0 +1,128 @@
+import json
+import logging
+
+from redis.exceptions import RedisError
+from telegram.ext import BasePersistence, PersistenceInput
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+async def flush_user_data(update, context):
+    # Handler tras los del bot: los cambios del usuario llegan a Redis antes de
+    # responder a su siguiente update, que puede atender otra réplica, sin
+    # esperar al volcado periódico de PTB (update_interval)
+    persistence = context.application.persistence
+    if persistence is not None and update.effective_user is not None:
+        await persistence.update_user_data(update.effective_user.id, context.user_data)
+
+class RedisPersistence(BasePersistence):
+    # Persiste solo user_data, en un hash por usuario (shpd-user:{id}) con un
+    # campo JSON por clave. Cada volcado escribe únicamente las claves que
+    # cambiaron desde el último y renueva el TTL del usuario.
+    def __init__(self, redis, ttl: int = 7 * 24 * 3600, update_interval: float = 1):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._redis = redis
+        self._ttl = ttl
+        # Último estado serializado que coincide con Redis, por usuario
+        self._snapshots: dict[int, dict[str, str]] = {}
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"shpd-user:{user_id}"
+
+    def _serialize(self, user_id: int, data: dict) -> dict[str, str]:
+        serialized = {}
+        for key, value in data.items():
+            try:
+                serialized[key] = _dumps(value)
+            except (TypeError, ValueError):
+                logging.warning(f"user_data[{key!r}] de {user_id} no es serializable; no se persiste.")
+        return serialized
+
+    # --- user_data ---
+    async def get_user_data(self) -> dict:
+        # Carga perezosa: cada usuario se lee en refresh_user_data al llegar su update
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        snapshot = self._snapshots.get(user_id)
+        # Si hay cambios locales aún no volcados, la copia local es la más reciente
+        if snapshot is not None and self._serialize(user_id, user_data) != snapshot:
+            return
+        try:
+            raw = await self._redis.hgetall(self._key(user_id))
+        except RedisError as e:
+            logging.error(f"No se pudo leer user_data de {user_id} desde Redis: {e}")
+            return
+        self._snapshots[user_id] = raw
+        user_data.clear()
+        user_data.update({key: json.loads(value) for key, value in raw.items()})
+
+    async def update_user_data(self, user_id: int, data: dict):
+        snapshot = self._snapshots.get(user_id, {})
+        serialized = self._serialize(user_id, data)
+        changed = {k: v for k, v in serialized.items() if snapshot.get(k) != v}
+        removed = [k for k in snapshot if k not in serialized]
+        if not changed and not removed:
+            return
+        key = self._key(user_id)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                if changed:
+                    pipe.hset(key, mapping=changed)
+                if removed:
+                    pipe.hdel(key, *removed)
+                pipe.expire(key, self._ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logging.error(f"No se pudo guardar user_data de {user_id} en Redis: {e}")
+            return
+        self._snapshots[user_id] = serialized
+
+    async def drop_user_data(self, user_id: int):
+        self._snapshots.pop(user_id, None)
+        try:
+            await self._redis.delete(self._key(user_id))
+        except RedisError as e:
+            logging.error(f"No se pudo borrar user_data de {user_id} en Redis: {e}")
+
+    # --- Datos no persistidos ---
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name) -> dict:
+        return {}
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def flush(self):
+        # Las escrituras son inmediatas en update_user_data; no queda nada pendiente
+        pass
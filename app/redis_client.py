@@ -0,0 +1,68 @@
+import os
+import asyncio
+import logging
+
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError, RedisError
+
+# --- Configuración de Redis ---
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", "3"))
+
+def create_pool() -> aioredis.BlockingConnectionPool:
+    # El pool no abre conexiones hasta el primer comando; si Redis cae, cada
+    # comando reintenta con backoff y vuelve a conectar en lugar de quedar deshabilitado.
+    return aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+        retry=Retry(ExponentialBackoff(cap=2, base=0.05), REDIS_RETRIES),
+        retry_on_error=[ConnectionError, TimeoutError],
+    )
+
+r = aioredis.Redis(connection_pool=create_pool())
+
+async def check_redis(retries: int = 3, backoff: float = 0.5) -> bool:
+    # Sin Redis el bot arranca igualmente: el cliente reconecta en cada comando
+    for attempt in range(retries):
+        try:
+            await r.ping()
+            logging.info("Conexión a Redis exitosa desde el Bot.")
+            return True
+        except RedisError as e:
+            if attempt == retries - 1:
+                logging.error(f"No se pudo conectar a Redis desde el Bot: {e}")
+                return False
+            await asyncio.sleep(min(backoff * 2 ** attempt, 5))
+
+async def listen_invalidations(channel: str, on_message, on_reset, redis=r, label: str = "Redis"):
+    # Bucle de suscripción compartido por las cachés en memoria. Al (re)suscribirse
+    # se llama a on_reset: lo publicado mientras no estábamos suscritos se perdió,
+    # así que la copia local se descarta entera. El TTL de cada caché acota el
+    # tiempo que una entrada obsoleta puede sobrevivir si aun así se pierde algo.
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            on_reset()
+            async for message in pubsub.listen():
+                on_message(message["data"])
+        except RedisError as e:
+            logging.error(f"{label}: error en la suscripción a {channel}: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+async def close_redis():
+    await r.aclose()
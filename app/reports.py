@@ -0,0 +1,127 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import select, and_, or_
+
+from models import MetricaResumen
+from db import AsyncSessionLocal, last_sessions, last_events
+from cache import StaleWhileRevalidateCache
+
+# --- Informes de métricas desde los acumulados ---
+REPORT_FRESH_TTL = float(os.getenv("REPORT_FRESH_TTL", "60"))
+REPORT_STALE_TTL = float(os.getenv("REPORT_STALE_TTL", "900"))
+REPORT_LAST_SESSIONS = int(os.getenv("REPORT_LAST_SESSIONS", "3"))
+REPORT_CHART_SESSIONS = int(os.getenv("REPORT_CHART_SESSIONS", "10"))
+REPORT_LAST_EVENTS = int(os.getenv("REPORT_LAST_EVENTS", "5"))
+
+AUDIT_ACTIONS = {
+    "registro_paciente": "📝 Registro",
+    "edicion_paciente": "✏️ Datos modificados",
+    "sesion_creada": "▶️ Sesión iniciada",
+    "umbral_alerta": "🔔 Umbral de alerta",
+}
+
+report_cache = StaleWhileRevalidateCache(fresh_ttl=REPORT_FRESH_TTL, stale_ttl=REPORT_STALE_TTL)
+
+def _format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes >= 60:
+        return f"{minutes // 60} h {minutes % 60:02d} min"
+    return f"{minutes} min"
+
+def _render_period(label: str, resumen) -> str:
+    if resumen is None:
+        return f"<b>{label}</b>\nSin datos registrados."
+    total = resumen.segundos_correcta + resumen.segundos_incorrecta
+    correcta = resumen.segundos_correcta * 100 / total if total else 0
+    return (
+        f"<b>{label}</b>\n"
+        f"✅ Postura correcta: {correcta:.0f}%\n"
+        f"⚠️ Postura incorrecta: {100 - correcta if total else 0:.0f}%\n"
+        f"🪑 Sentado: {_format_duration(resumen.tiempo_sentado)}\n"
+        f"🧍 De pie: {_format_duration(resumen.tiempo_parado)}\n"
+        f"🔔 Alertas: {resumen.alertas_enviadas}"
+    )
+
+def _render_sessions(sesiones) -> str:
+    if not sesiones:
+        return "<b>Últimas sesiones</b>\nSin sesiones registradas."
+    lines = ["<b>Últimas sesiones</b>"]
+    for sesion in sesiones:
+        correcta = f"{sesion.porcentaje_correcta:.0f}% correcta" if sesion.porcentaje_correcta is not None else "sin métricas"
+        lines.append(
+            f"• {sesion.inicio:%d/%m %H:%M} ({_format_duration(sesion.intervalo_segundos or 0)}): "
+            f"{correcta}, {sesion.alertas_enviadas} alertas"
+        )
+    return "\n".join(lines)
+
+def _render_events(eventos) -> str:
+    if not eventos:
+        return "<b>Actividad reciente</b>\nSin actividad registrada."
+    lines = ["<b>Actividad reciente</b>"]
+    for evento in eventos:
+        detalle = evento.detalle or {}
+        if evento.accion == "edicion_paciente":
+            extra = ", ".join(detalle.get("cambios", {}))
+        elif evento.accion == "umbral_alerta":
+            extra = f"{detalle.get('segundos')} s"
+        elif evento.accion == "sesion_creada":
+            extra = _format_duration(detalle.get("intervalo_segundos") or 0)
+        else:
+            extra = ""
+        label = AUDIT_ACTIONS.get(evento.accion, evento.accion)
+        lines.append(f"• {evento.ocurrido_en:%d/%m %H:%M} {label}" + (f": {extra}" if extra else ""))
+    return "\n".join(lines)
+
+async def _load_summary(paciente_id: int, today: date, actividad: bool) -> dict:
+    week = today - timedelta(days=today.weekday())
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(MetricaResumen).where(
+                MetricaResumen.paciente_id == paciente_id,
+                or_(
+                    and_(MetricaResumen.periodo == "dia", MetricaResumen.inicio == today),
+                    and_(MetricaResumen.periodo == "semana", MetricaResumen.inicio == week),
+                ),
+            )
+        )
+        summary = {row.periodo: row for row in result.scalars()}
+        summary["sesiones"] = await last_sessions(db, paciente_id, REPORT_LAST_SESSIONS)
+        if actividad:
+            summary["eventos"] = await last_events(db, paciente_id, REPORT_LAST_EVENTS)
+        return summary
+
+async def render_report(paciente_id: int, title: str, actividad: bool = False) -> str:
+    # El día forma parte de la clave: al cambiar de día no se sirve el informe anterior.
+    # actividad=True añade los últimos eventos de auditoría (informe del especialista).
+    today = date.today()
+
+    async def load():
+        summary = await _load_summary(paciente_id, today, actividad)
+        report = (
+            f"{title}\n\n"
+            f"{_render_period('Hoy', summary.get('dia'))}\n\n"
+            f"{_render_period('Esta semana', summary.get('semana'))}\n\n"
+            f"{_render_sessions(summary['sesiones'])}"
+        )
+        if actividad:
+            report += f"\n\n{_render_events(summary['eventos'])}"
+        return report
+
+    return await report_cache.get((paciente_id, today, title, actividad), load)
+
+async def chart_points(paciente_id: int) -> list:
+    # [(día, % correcta)] de las últimas sesiones en orden cronológico, para el gráfico.
+    # Redondeado para que los mismos datos den siempre la misma imagen (y el mismo file_id).
+    today = date.today()
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            sesiones = await last_sessions(db, paciente_id, REPORT_CHART_SESSIONS)
+        return [
+            (f"{sesion.inicio:%d/%m}", round(sesion.porcentaje_correcta, 1))
+            for sesion in reversed(sesiones)
+            if sesion.porcentaje_correcta is not None
+        ]
+
+    return await report_cache.get((paciente_id, today, "chart"), load)
@@ -0,0 +1,169 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+from sqlalchemy import update, func
+from telegram.error import TelegramError
+
+from models import Sesion
+from db import AsyncSessionLocal, get_session_owner
+from redis_client import r
+from ingest import CLOSE_EVENT, INGEST_STREAM_MAXLEN, samples_stream
+from device_config import SET_CONFIG_LUA, config_args, config_key
+
+# --- Ciclo de vida de las sesiones ---
+# Plazos de cierre en un único ZSET (session_id -> timestamp de fin). Sobrevive
+# a reinicios y a varias réplicas: cada una consulta los vencidos y el ZREM
+# decide quién cierra cada sesión.
+SESSION_DEADLINES = "shpd-session-deadlines"
+# Margen tras el fin antes de que Redis borre las claves por su cuenta
+SESSION_KEY_GRACE = int(os.getenv("SESSION_KEY_GRACE", "300"))
+SESSION_TICK = float(os.getenv("SESSION_TICK", "1"))
+SESSION_BATCH = int(os.getenv("SESSION_BATCH", "500"))
+SESSION_RETRY_DELAY = float(os.getenv("SESSION_RETRY_DELAY", "30"))
+
+# Apertura y cierre en un único EVALSHA cada uno: un script dentro de un pipeline
+# obliga a redis-py a enviar antes SCRIPT EXISTS (dos round trips).
+# Apertura: claves de la sesión, su caducidad, su plazo de cierre y, si se pasa,
+# la configuración del dispositivo (ARGV[8] en adelante, como en SET_CONFIG_SCRIPT)
+OPEN_SESSION_SCRIPT = SET_CONFIG_LUA + """
+redis.call('HSET', KEYS[1], 'start_ts', ARGV[1], 'intervalo_segundos', ARGV[2],
+    'device_id', ARGV[3], 'telegram_id', ARGV[4])
+redis.call('HSET', KEYS[2], 'session_id', ARGV[5], 'telegram_id', ARGV[4])
+redis.call('EXPIREAT', KEYS[1], ARGV[7])
+redis.call('EXPIREAT', KEYS[2], ARGV[7])
+redis.call('ZADD', KEYS[3], ARGV[6], ARGV[5])
+if #ARGV > 9 then
+    return set_config(KEYS[4], ARGV[8], ARGV[9], {unpack(ARGV, 10)})
+end
+return 0
+"""
+
+# Cierre: evento de cierre para la ingesta y borrado de las claves. shpd-data:{device_id}
+# solo se borra si sigue apuntando a la sesión que se cierra: si el paciente ya
+# empezó otra, su mapeo no se toca
+CLOSE_SESSION_SCRIPT = """
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'session_id', ARGV[1], 'evento', ARGV[2])
+if redis.call('HGET', KEYS[2], 'session_id') == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+end
+return redis.call('DEL', KEYS[3])
+"""
+
+def session_key(session_id: str) -> str:
+    return f"shpd-session:{session_id}"
+
+def device_key(device_id: str) -> str:
+    return f"shpd-data:{device_id}"
+
+def open_session(client, session_id: str, device_id: str, telegram_id: str, intervalo_segundos: int,
+                 start_ts: int, config: dict = None):
+    # Con client=pipeline (p. ej. aperturas masivas) la llamada se encola en él
+    deadline = start_ts + intervalo_segundos
+    args = [start_ts, intervalo_segundos, device_id, telegram_id, session_id, deadline, deadline + SESSION_KEY_GRACE]
+    if config:
+        args.extend(config_args(device_id, config))
+    return client.register_script(OPEN_SESSION_SCRIPT)(
+        keys=[session_key(session_id), device_key(device_id), SESSION_DEADLINES, config_key(device_id)],
+        args=args,
+    )
+
+class SessionScheduler:
+    def __init__(self, bot, redis=r):
+        self._bot = bot
+        self._redis = redis
+        self._close_session = redis.register_script(CLOSE_SESSION_SCRIPT)
+        self._task: asyncio.Task = None
+        self._notifications: set[asyncio.Task] = set()
+        self.closed = 0
+
+    async def _owner(self, session_id: str) -> dict:
+        # Claves ya caducadas (el planificador estuvo parado más que SESSION_KEY_GRACE):
+        # el dispositivo y el paciente se leen de la base de datos
+        async with AsyncSessionLocal() as db:
+            owner = await get_session_owner(db, session_id)
+        if owner is None:
+            return {}
+        return {"device_id": owner.device_id, "telegram_id": owner.telegram_id,
+                "intervalo_segundos": owner.intervalo_segundos or 0}
+
+    async def _close(self, session_id: str):
+        data = await self._redis.hgetall(session_key(session_id)) or await self._owner(session_id)
+        device_id = data.get("device_id")
+        if not device_id:
+            # Sesión desconocida: solo queda registrar su fin
+            return
+        # El evento de cierre hace que la ingesta vuelque ya la última métrica de la sesión
+        await self._close_session(
+            keys=[samples_stream(device_id), device_key(device_id), session_key(session_id)],
+            args=[session_id, CLOSE_EVENT, INGEST_STREAM_MAXLEN],
+        )
+        self.closed += 1
+        telegram_id = data.get("telegram_id")
+        if telegram_id:
+            task = asyncio.create_task(self._notify(telegram_id, int(data.get("intervalo_segundos", 0))))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
+
+    async def _mark_finished(self, session_ids: list):
+        # Un único UPDATE por lote de sesiones cerradas
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Sesion)
+                    .where(Sesion.id.in_([uuid.UUID(session_id) for session_id in session_ids]), Sesion.fin.is_(None))
+                    .values(fin=func.now())
+                )
+                await db.commit()
+        except Exception as e:
+            logging.error(f"No se pudo registrar el fin de {len(session_ids)} sesiones: {e}")
+
+    async def _notify(self, telegram_id: str, intervalo_segundos: int):
+        try:
+            await self._bot.send_message(
+                chat_id=telegram_id,
+                text=f"⏱️ Tu sesión de {intervalo_segundos // 60} minutos ha finalizado. "
+                     f"Consulta el resultado en '📊 Ver métricas'.",
+            )
+        except TelegramError as e:
+            logging.error(f"No se pudo avisar del fin de sesión a {telegram_id}: {e}")
+
+    async def run_once(self) -> int:
+        due = await self._redis.zrangebyscore(SESSION_DEADLINES, "-inf", time.time(), start=0, num=SESSION_BATCH)
+        finished = []
+        for session_id in due:
+            if not await self._redis.zrem(SESSION_DEADLINES, session_id):
+                continue  # la cerró otra réplica
+            try:
+                await self._close(session_id)
+                finished.append(session_id)
+            except Exception as e:
+                # Redis o, con las claves caducadas, la base de datos
+                logging.error(f"No se pudo cerrar la sesión {session_id}, se reintentará: {e}")
+                await self._redis.zadd(SESSION_DEADLINES, {session_id: time.time() + SESSION_RETRY_DELAY})
+        if finished:
+            await self._mark_finished(finished)
+        return len(due)
+
+    async def _loop(self):
+        while True:
+            try:
+                # Si quedan más vencidas que un lote se sigue sin esperar
+                if await self.run_once() < SESSION_BATCH:
+                    await asyncio.sleep(SESSION_TICK)
+            except RedisError as e:
+                logging.error(f"Planificador de sesiones: error de Redis: {e}")
+                await asyncio.sleep(SESSION_TICK)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+        logging.info("Planificador de sesiones iniciado.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*self._notifications, return_exceptions=True)
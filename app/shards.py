@@ -0,0 +1,152 @@
+import os
+import signal
+import asyncio
+import logging
+import multiprocessing
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# --- Ejecución repartida en varios procesos ---
+# Un proceso frontal recibe los updates (polling o webhook) y los reparte entre
+# SHARD_WORKERS procesos por effective_user.id: los updates de un usuario van
+# siempre al mismo worker, y su user_data y su cubo de admisión viven en ese
+# proceso. Dentro del worker, PerUserUpdateProcessor los atiende de uno en uno. Cada worker arranca la aplicación completa con sus propios
+# pools de Postgres y Redis (spawn: nada se hereda del proceso frontal).
+#
+#   SHARD_WORKERS=4 python app/shards.py
+#
+# Este módulo no importa bot al cargarse: spawn lo vuelve a importar en cada
+# worker y la configuración de cada uno debe fijarse antes de importar bot.
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "10000"))
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # Hasta max_concurrent_updates updates a la vez, pero los de un mismo usuario
+    # en orden de llegada y nunca en paralelo (user_data, estado del menú). Un
+    # update en espera ocupa su hueco: la admisión ya limita la ráfaga por usuario.
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # user_id -> [lock, updates en espera o en curso]
+        self._users: dict[int, list] = {}
+
+    async def do_process_update(self, update, coroutine):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await coroutine
+            return
+        entry = self._users.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._users[user.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+def shard_for(update: Update, workers: int) -> int:
+    # Updates sin usuario (p. ej. encuestas) van al worker 0
+    user = update.effective_user
+    return user.id % workers if user is not None else 0
+
+def _worker_env(index: int, workers: int):
+    # Tareas de fondo únicas (alertas y cierre de sesiones) solo en el worker 0; el
+    # límite global de la cola de salida se reparte entre todos los workers
+    if index:
+        os.environ["ALERT_ENGINE"] = "false"
+        os.environ["SESSION_SCHEDULER"] = "false"
+    os.environ["OUTBOX_GLOBAL_RATE"] = str(float(os.getenv("OUTBOX_GLOBAL_RATE", "30")) / workers)
+    metrics_port = int(os.getenv("METRICS_PORT", "9100"))
+    if metrics_port:
+        os.environ["METRICS_PORT"] = str(metrics_port + index)
+
+async def _serve(app, queue, index: int):
+    # Lo mismo que run_polling/run_webhook, pero los updates llegan por la cola del proceso frontal
+    loop = asyncio.get_running_loop()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    logging.info(f"Worker {index} listo (pid {os.getpid()}).")
+    try:
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            await app.update_queue.put(Update.de_json(data, app.bot))
+    finally:
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+def _worker(index: int, workers: int, queue):
+    # Ctrl+C llega a todo el grupo: el worker termina cuando el frontal le envía None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_env(index, workers)
+    from bot import build_application
+    asyncio.run(_serve(build_application(updater=False), queue, index))
+
+async def _front(app, queues: list, webhook: dict):
+    # Del Application solo se usan el bot y el updater: sin handlers ni tareas de fondo
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await app.bot.initialize()
+    await app.updater.initialize()
+    if webhook:
+        await app.updater.start_webhook(**webhook)
+    else:
+        await app.updater.start_polling()
+    logging.info(f"Proceso frontal repartiendo updates entre {len(queues)} workers.")
+
+    async def route():
+        while True:
+            update = await app.update_queue.get()
+            # Cola llena: put bloquea (en un hilo, no en el bucle) y el frontal deja de
+            # recibir hasta que el worker se pone al día
+            queue = queues[shard_for(update, len(queues))]
+            await loop.run_in_executor(None, queue.put, update.to_dict())
+
+    router = asyncio.create_task(route())
+    await stop.wait()
+    await app.updater.stop()
+    # Lo que ya se recibió se entrega antes de parar los workers
+    while not app.update_queue.empty():
+        await asyncio.sleep(0.05)
+    router.cancel()
+    await asyncio.gather(router, return_exceptions=True)
+    await app.updater.shutdown()
+    await app.bot.shutdown()
+
+def run_sharded(app, workers: int, webhook: dict = None):
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue(SHARD_QUEUE_SIZE) for _ in range(workers)]
+    processes = [
+        ctx.Process(target=_worker, args=(index, workers, queue), name=f"shpd-worker-{index}")
+        for index, queue in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        asyncio.run(_front(app, queues, webhook))
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join()
+        logging.info("Workers detenidos.")
+
+if __name__ == "__main__":
+    from bot import BOT_MODE, build_application, webhook_options
+    run_sharded(build_application(), SHARD_WORKERS, webhook_options() if BOT_MODE == "webhook" else None)
@@ -0,0 +1,79 @@
+# Latencia evento -> mensaje del motor de alertas (p50/p95/p99).
+#
+# Publica muestras de mala postura sostenida para BENCH_DEVICES dispositivos
+# con un umbral de 1 s y mide, para cada alerta, el tiempo entre la entrada del
+# stream que cruza el umbral y la llamada a send_message. Requiere un Redis
+# local; la base por defecto es SQLite (requiere aiosqlite).
+#
+#   REDIS_HOST=localhost python bench/alert_latency.py
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("ALERT_COALESCE_SECONDS", "0.2")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from models import Base
+from db import engine
+from redis_client import r
+from ingest import samples_stream
+from alerts import AlertEngine
+from device_config import config_key
+
+DEVICES = int(os.getenv("BENCH_DEVICES", "500"))
+SECONDS = int(os.getenv("BENCH_SECONDS", "5"))
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+async def publish():
+    # Una muestra por segundo y dispositivo, todas de mala postura
+    for second in range(SECONDS):
+        t0 = time.time()
+        async with r.pipeline(transaction=False) as pipe:
+            for d in range(DEVICES):
+                pipe.xadd(samples_stream(f"alert-bench-{d}"), {
+                    "session_id": "bench", "postura": "incorrecta", "ts": t0,
+                })
+            await pipe.execute()
+        await asyncio.sleep(max(0.0, 1 - (time.time() - t0)))
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    async with r.pipeline(transaction=False) as pipe:
+        for d in range(DEVICES):
+            device_id = f"alert-bench-{d}"
+            pipe.delete(samples_stream(device_id))
+            pipe.xadd(samples_stream(device_id), {"session_id": "bench", "postura": "correcta"})
+            pipe.hset(config_key(device_id), "alert_threshold", 1)
+            pipe.hset(f"shpd-data:{device_id}", mapping={"telegram_id": str(100_000 + d)})
+        await pipe.execute()
+
+    bot = FakeBot()
+    alert_engine = AlertEngine(bot)
+    alert_engine.start()
+    await asyncio.sleep(1)
+    await publish()
+    await asyncio.sleep(2)
+    await alert_engine.stop()
+
+    print(f"{alert_engine.alerts_fired} alertas, {bot.sent} mensajes")
+    for p in (0.5, 0.95, 0.99):
+        print(f"p{int(p * 100)}: {alert_engine.latency_percentile(p) * 1000:.1f} ms")
+
+    async with r.pipeline(transaction=False) as pipe:
+        for d in range(DEVICES):
+            device_id = f"alert-bench-{d}"
+            pipe.delete(samples_stream(device_id), config_key(device_id), f"shpd-data:{device_id}")
+        await pipe.execute()
+    await r.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# Coste del registro de auditoría en el handler y throughput del volcado.
+#
+# Mide cuánto cuesta AuditLog.record() (lo único que paga el handler), cuántos
+# eventos/s vuelca flush() por lotes y, con la base de datos caída, cuánto
+# tarda el desvío a un segmento local y su reenvío posterior. La base por
+# defecto es SQLite (requiere aiosqlite).
+#
+#   BENCH_EVENTS=50000 python bench/audit_log.py
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import func, select
+
+from models import Base, EventoAuditoria
+from db import engine, AsyncSessionLocal
+from audit import AuditLog
+
+EVENTS = int(os.getenv("BENCH_EVENTS", "20000"))
+
+class BrokenSession:
+    # Base de datos caída: cualquier escritura falla
+    async def __aenter__(self):
+        raise ConnectionError("base de datos no disponible")
+
+    async def __aexit__(self, *exc):
+        return False
+
+def fill(log: AuditLog) -> float:
+    t0 = time.perf_counter()
+    for i in range(EVENTS):
+        log.record("umbral_alerta", str(100_000 + i), None, segundos=30)
+    return time.perf_counter() - t0
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    segments = Path(tempfile.mkdtemp())
+
+    log = AuditLog(segment_dir=segments)
+    elapsed = fill(log)
+    print(f"record(): {elapsed / EVENTS * 1e6:.2f} µs por evento")
+    t0 = time.perf_counter()
+    await log.flush()
+    elapsed = time.perf_counter() - t0
+    print(f"flush a la base de datos: {EVENTS / elapsed:,.0f} eventos/s {log.stats()}")
+
+    down = AuditLog(session_factory=BrokenSession, segment_dir=segments)
+    fill(down)
+    t0 = time.perf_counter()
+    await down.flush()
+    print(f"desvío a segmento local: {(time.perf_counter() - t0) * 1000:.1f} ms {down.stats()}")
+
+    t0 = time.perf_counter()
+    await log.flush()
+    print(f"reenvío del segmento: {(time.perf_counter() - t0) * 1000:.1f} ms {log.stats()}")
+    async with AsyncSessionLocal() as db:
+        total = await db.scalar(select(func.count()).select_from(EventoAuditoria))
+    print(f"{total} eventos en la tabla (esperados {2 * EVENTS})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# Reenvío de mensajes de chat entre dos "réplicas".
+#
+# La réplica A abre BENCH_CHATS conversaciones y la réplica B reenvía
+# BENCH_MESSAGES mensajes por conversación: mide mensajes/s, cuántas rutas se
+# resolvieron en memoria frente a Redis y cuánto tarda la invalidación por
+# pub/sub en llegar a B al cerrar las conversaciones desde A. Requiere un
+# Redis local; la base por defecto es SQLite (requiere aiosqlite).
+#
+#   REDIS_HOST=localhost python bench/chat_relay.py
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from models import Base
+from db import engine
+from redis_client import r
+from chat import ChatRelay
+
+CHATS = int(os.getenv("BENCH_CHATS", "200"))
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "50"))
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    a, b = ChatRelay(FakeBot()), ChatRelay(FakeBot())
+    a.start()
+    b.start()
+    await asyncio.sleep(0.5)
+    pairs = [
+        (SimpleNamespace(id=i, telegram_id=f"esp-{i}", nombre=f"Especialista {i}"),
+         SimpleNamespace(id=i, telegram_id=f"pac-{i}", nombre=f"Paciente {i}"))
+        for i in range(CHATS)
+    ]
+    for especialista, paciente in pairs:
+        await a.open(especialista, paciente)
+
+    t0 = time.perf_counter()
+    for _ in range(MESSAGES):
+        await asyncio.gather(*(b.relay(paciente.telegram_id, "hola") for _, paciente in pairs))
+    elapsed = time.perf_counter() - t0
+    print(f"{b.relayed} mensajes en {elapsed:.2f} s ({b.relayed / elapsed:,.0f}/s), rutas: {b.stats()}")
+
+    t0 = time.perf_counter()
+    for especialista, _ in pairs:
+        await a.close(especialista.telegram_id)
+    while any(await asyncio.gather(*(b.route(paciente.telegram_id) for _, paciente in pairs))):
+        await asyncio.sleep(0.01)
+    print(f"cierre visible en B tras {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    await a.stop()
+    await b.stop()
+    await r.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
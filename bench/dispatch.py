@@ -0,0 +1,76 @@
+# Coste por mensaje de elegir el handler: tabla de despacho vs. cadena de ifs.
+#
+# legacy_route reproduce el orden de comparaciones del handle_text anterior
+# (solo la decisión, sin E/S) para compararlo con resolve_text_handler.
+import os
+import sys
+import tempfile
+import timeit
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from bot import resolve_text_handler, MAIN_MENU
+
+def legacy_route(user_data: dict, text: str):
+    choice = text.split('.')[0] if "." in text else text
+    state = user_data.get("state")
+    if user_data.get("rol") is None:
+        if text.lower() == "paciente":
+            return "rol"
+        elif text.lower() == "especialista":
+            return "rol"
+        return "rol"
+    role = user_data.get("rol")
+    if state == "awaiting_specialist_name":
+        return "specialist_name"
+    if state == "awaiting_specialist_age":
+        return "specialist_age"
+    if role == "especialista":
+        if text == "📋 Ver lista de pacientes":
+            return "list"
+        if text == "📊 Informes de paciente":
+            return "reports"
+        if text == "⚙️ Ajustes de servicio":
+            return "settings"
+        if text == "🔔 Alertas de riesgo":
+            return "alerts"
+        if text == "🗂️ Exportar datos":
+            return "export"
+        if text == "💬 Chat con especialista":
+            return "chat"
+    if role == "paciente" and choice == "3" and state is None:
+        return "alert_menu"
+    if state == "awaiting_alert_custom_value":
+        return "alert_custom"
+    if choice == "4":
+        return "my_data"
+    if state is None and user_data.get('modificar_paciente'):
+        return "confirm"
+    if state == 'awaiting_patient_data':
+        return "patient_data"
+    if choice == "1" and state is None:
+        return "session_menu"
+    if state == 'awaiting_session_config':
+        return "session_config"
+    if choice in MAIN_MENU and choice not in ("1", "4", "3"):
+        return "not_implemented"
+    if not state:
+        return "menu"
+
+CASES = [
+    ("especialista: 💬 Chat", {"rol": "especialista"}, "💬 Chat con especialista"),
+    ("especialista: lista", {"rol": "especialista"}, "📋 Ver lista de pacientes"),
+    ("paciente: 1. sesión", {"rol": "paciente"}, "1. ⚙️ Configurar sesión"),
+    ("paciente: 6. ayuda", {"rol": "paciente"}, "6. ❓ Ayuda"),
+    ("paciente: config sesión", {"rol": "paciente", "state": "awaiting_session_config"}, "2. 30 minutos"),
+    ("paciente: texto libre", {"rol": "paciente"}, "hola"),
+]
+
+if __name__ == "__main__":
+    n = 200_000
+    print(f"{'caso':<26} {'cadena ns':>10} {'tabla ns':>10}")
+    for name, user_data, text in CASES:
+        legacy = timeit.timeit(lambda: legacy_route(user_data, text), number=n) / n * 1e9
+        table = timeit.timeit(lambda: resolve_text_handler(user_data, text), number=n) / n * 1e9
+        print(f"{name:<26} {legacy:>10.0f} {table:>10.0f}")
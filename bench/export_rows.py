@@ -0,0 +1,63 @@
+# Exportación de 1M filas de métricas: tiempo y memoria pico.
+#
+# Siembra BENCH_ROWS filas en metricas_posturales y ejecuta write_export en CSV
+# (y Parquet si pyarrow está instalado), midiendo el pico de memoria Python
+# con tracemalloc. SQLite por defecto; DATABASE_URL para Postgres.
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import insert
+from models import Base, Sesion, MetricaPostural
+from db import engine
+from export import write_export, EXPORT_FORMATS
+
+ROWS = int(os.getenv("BENCH_ROWS", "1000000"))
+SESSIONS = 1000
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    sesiones = [{"id": uuid.uuid4(), "intervalo_segundos": 1800, "modo": "monitor_activo"} for _ in range(SESSIONS)]
+    with engine.begin() as conn:
+        conn.execute(insert(Sesion), sesiones)
+        batch = []
+        for i in range(ROWS):
+            batch.append({
+                "sesion_id": sesiones[i % SESSIONS]["id"],
+                "porcentaje_correcta": 75.0,
+                "porcentaje_incorrecta": 25.0,
+                "tiempo_sentado": 4.5,
+                "tiempo_parado": 0.5,
+                "alertas_enviadas": i % 3,
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(MetricaPostural), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(MetricaPostural), batch)
+
+def main():
+    seed()
+    for fmt in EXPORT_FORMATS:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        out, filename, rows = write_export(fmt)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = out.seek(0, os.SEEK_END)
+        out.close()
+        print(
+            f"{fmt:>7}: {rows} filas en {elapsed:.1f} s ({rows / elapsed:,.0f} filas/s), "
+            f"{size / 2**20:.1f} MiB, pico de memoria {peak / 2**20:.1f} MiB"
+        )
+
+if __name__ == "__main__":
+    main()
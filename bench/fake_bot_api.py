@@ -0,0 +1,126 @@
+# Servidor local que imita la Bot API de Telegram para benchmarks.
+#
+# Responde a los métodos que usa el bot con resultados mínimos válidos para
+# python-telegram-bot y registra cada llamada, de modo que un benchmark puede
+# esperar la respuesta que el bot envía a un chat concreto.
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+
+import tornado.web
+
+BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "shpd-bot",
+    "username": "shpd_bot",
+    "can_join_groups": False,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": True,
+}
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText", "editMessageReplyMarkup"}
+
+class FakeBotAPI:
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.sent = []
+        self.webhook_set = asyncio.Event()
+        # Si se define, recibe (method, params) y devuelve segundos de retry_after
+        # para simular un 429 de Telegram, o None para responder normalmente.
+        self.rate_limit = None
+        self._waiters = defaultdict(list)
+        self._ids = itertools.count(1)
+        self._server = None
+
+    def start(self, port: int, address: str = "127.0.0.1"):
+        app = tornado.web.Application([(r"/bot[^/]+/(\w+)", _MethodHandler, {"api": self})])
+        self._server = app.listen(port, address=address)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop()
+
+    def wait_for(self, chat_id, contains: str = None) -> asyncio.Future:
+        # Con `contains` solo resuelve un envío cuyo texto (o caption) lo incluya:
+        # un paso que responde con varios mensajes no adelanta al siguiente
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[str(chat_id)].append((fut, contains))
+        return fut
+
+    def _message(self, params: dict) -> dict:
+        message = {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        return message
+
+    def handle(self, method: str, params: dict):
+        self.calls[method] += 1
+        if self.rate_limit is not None:
+            retry_after = self.rate_limit(method, params)
+            if retry_after:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                }
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "getUpdates":
+            result = []
+        elif method == "setWebhook":
+            self.webhook_set.set()
+            result = True
+        elif method in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            result = True if "inline_message_id" in params else self._message(params)
+        elif method == "sendPhoto":
+            result = self._message(params)
+            n = result["message_id"]
+            result["photo"] = [{"file_id": f"photo-{n}", "file_unique_id": f"u-photo-{n}", "width": 1, "height": 1}]
+        elif method == "sendDocument":
+            result = self._message(params)
+            n = result["message_id"]
+            result["document"] = {"file_id": f"doc-{n}", "file_unique_id": f"u-doc-{n}"}
+        else:
+            result = True
+
+        if method in SEND_METHODS:
+            chat_id = params.get("chat_id")
+            self.sent.append((time.perf_counter(), method, chat_id, params))
+            text = str(params.get("text") or params.get("caption") or "")
+            waiting = []
+            for fut, contains in self._waiters.pop(str(chat_id), []):
+                if fut.done():
+                    continue
+                if contains is None or contains in text:
+                    fut.set_result(params)
+                else:
+                    waiting.append((fut, contains))
+            if waiting:
+                self._waiters[str(chat_id)] = waiting
+        return 200, {"ok": True, "result": result}
+
+class _MethodHandler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotAPI):
+        self.api = api
+
+    def post(self, method: str):
+        params = {k: v[-1].decode() for k, v in self.request.body_arguments.items()}
+        if not params and self.request.body and "json" in self.request.headers.get("Content-Type", ""):
+            params = json.loads(self.request.body)
+        for name in self.request.files:
+            params[name] = "<file>"
+        status, payload = self.api.handle(method, params)
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(payload))
+
+    get = post
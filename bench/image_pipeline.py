@@ -0,0 +1,54 @@
+# Coste de enviar gráficos de informe: render + subida frente a reutilizar el file_id.
+#
+# Dibuja el gráfico de sesiones (en un hilo, como el bot) y lo envía BENCH_SENDS
+# veces a la Bot API falsa: primero sin cache (cada envío renderiza y sube los
+# bytes) y después con FileIdCache (una subida y el resto por file_id).
+#
+#   python bench/image_pipeline.py
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from telegram import Bot
+
+from fake_bot_api import FakeBotAPI
+from images import FileIdCache, chart_key, render_sessions_chart
+
+API_PORT = int(os.getenv("BENCH_API_PORT", "8081"))
+SENDS = int(os.getenv("BENCH_SENDS", "200"))
+POINTS = [(f"{day:02d}/10", 40 + day * 5 % 60) for day in range(1, 11)]
+
+async def produce():
+    return await asyncio.to_thread(render_sessions_chart, POINTS)
+
+async def timed(label, send):
+    t0 = time.perf_counter()
+    for _ in range(SENDS):
+        await send()
+    elapsed = time.perf_counter() - t0
+    print(f"{label}: {elapsed * 1000 / SENDS:.1f} ms por envío")
+
+async def main():
+    api = FakeBotAPI()
+    api.start(API_PORT)
+    bot = Bot("123:bench", base_url=f"http://127.0.0.1:{API_PORT}/bot")
+    try:
+        async with bot:
+            png = await produce()
+            print(f"gráfico: {len(png) / 1024:.1f} KiB")
+
+            async def upload():
+                await bot.send_photo(chat_id=1, photo=await produce())
+            await timed("render + subida", upload)
+
+            cache = FileIdCache()
+            await timed("FileIdCache", lambda: cache.send_photo(bot, 1, chart_key(POINTS), produce))
+            print(f"FileIdCache: {cache.stats()}")
+    finally:
+        api.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
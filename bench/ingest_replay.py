@@ -0,0 +1,69 @@
+# Replay de muestras de postura contra la ingesta de métricas.
+#
+# Publica BENCH_SAMPLES muestras repartidas entre BENCH_DEVICES streams y mide
+# cuánto tarda IngestWorker en consumirlas y volcarlas a la base de datos.
+# Requiere un Redis local; la base por defecto es SQLite (requiere aiosqlite).
+#
+#   REDIS_HOST=localhost python bench/ingest_replay.py
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("INGEST_FLUSH_INTERVAL", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import func, select
+from models import Base, MetricaPostural
+from db import engine, AsyncSessionLocal
+from redis_client import r
+from ingest import IngestWorker, samples_stream
+
+DEVICES = int(os.getenv("BENCH_DEVICES", "200"))
+SAMPLES = int(os.getenv("BENCH_SAMPLES", "200000"))
+
+async def publish():
+    rnd = random.Random(1)
+    sessions = {f"bench-{d}": str(uuid.uuid4()) for d in range(DEVICES)}
+    async with r.pipeline(transaction=False) as pipe:
+        for i in range(SAMPLES):
+            device_id = f"bench-{i % DEVICES}"
+            pipe.xadd(samples_stream(device_id), {
+                "session_id": sessions[device_id],
+                "postura": "incorrecta" if rnd.random() < 0.3 else "correcta",
+                "estado": "parado" if rnd.random() < 0.1 else "sentado",
+                "dt": 1,
+                "alerta": 0,
+            })
+            if i % 5000 == 4999:
+                await pipe.execute()
+        await pipe.execute()
+
+async def main():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for d in range(DEVICES):
+        await r.delete(samples_stream(f"bench-{d}"))
+    await publish()
+
+    worker = IngestWorker()
+    t0 = time.perf_counter()
+    while worker.samples < SAMPLES:
+        await worker.run_once()
+    await worker.flush()
+    elapsed = time.perf_counter() - t0
+
+    async with AsyncSessionLocal() as db:
+        rows = await db.scalar(select(func.count()).select_from(MetricaPostural))
+    print(f"{worker.samples} muestras en {elapsed:.2f} s -> {worker.samples / elapsed:,.0f} muestras/s")
+    print(f"{rows} filas en metricas_posturales")
+    for d in range(DEVICES):
+        await r.delete(samples_stream(f"bench-{d}"))
+    await r.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,209 @@
+# Prueba de carga de extremo a extremo con la Bot API falsa.
+#
+# Arranca app/bot.py en modo webhook contra FakeBotAPI y guía a BENCH_USERS
+# pacientes y BENCH_SPECIALISTS especialistas por los flujos reales, fase a
+# fase y con todos los usuarios de cada fase en paralelo:
+#
+#   registro      /start, rol y los campos de FIELDS
+#   sesion        configurar una sesión de 10 minutos
+#   alertas       menú de alertas y umbral por botón inline
+#   especialista  registro y lista paginada de pacientes
+#
+# Cada paso espera la respuesta concreta que debe enviar el bot. Por flujo se
+# informa del throughput, p50/p95/p99 por update y las consultas SQL y comandos
+# de Redis por update (diferencia del endpoint /metrics del bot antes y después
+# de la fase). Requiere un Redis local; la base por defecto es SQLite (requiere
+# aiosqlite). Con BENCH_MAX_P99_MS sale con código 1 si algún flujo lo supera.
+#
+#   REDIS_HOST=localhost BENCH_USERS=1000 python bench/loadtest.py
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from fake_bot_api import FakeBotAPI
+from webhook_load import API_PORT, WEBHOOK_PORT, SECRET, percentile, start_bot, text_update
+
+USERS = int(os.getenv("BENCH_USERS", "500"))
+SPECIALISTS = int(os.getenv("BENCH_SPECIALISTS", "50"))
+METRICS_PORT = int(os.getenv("BENCH_METRICS_PORT", "9101"))
+MAX_P99_MS = float(os.getenv("BENCH_MAX_P99_MS", "0"))
+STEP_TIMEOUT = float(os.getenv("BENCH_STEP_TIMEOUT", "30"))
+# Ids distintos en cada ejecución por si se reutiliza una base Postgres
+BASE_ID = int(time.time()) % 1_000_000 * 10_000
+
+_callback_ids = itertools.count(1)
+
+def callback_update(user_id: int, data: str) -> dict:
+    update = text_update(user_id, "")
+    message = update["message"]
+    message["from"] = {"id": 1, "is_bot": True, "first_name": "shpd-bot"}
+    return {
+        "update_id": update["update_id"],
+        "callback_query": {
+            "id": str(next(_callback_ids)),
+            "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"},
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": message,
+        },
+    }
+
+def prepare_database():
+    # El bot ya no crea tablas al arrancar: migraciones en Postgres, create_all en SQLite
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from db import engine
+    if engine.dialect.name == "postgresql":
+        from migrate import migrate
+        migrate(engine)
+    else:
+        from models import Base
+        Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+class Runner:
+    def __init__(self, client: httpx.AsyncClient, api: FakeBotAPI):
+        self.client = client
+        self.api = api
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    async def step(self, user_id: int, payload: dict, expect: str) -> dict:
+        reply = self.api.wait_for(user_id, expect)
+        t0 = time.perf_counter()
+        await self.client.post(
+            f"http://127.0.0.1:{WEBHOOK_PORT}/telegram",
+            json=payload,
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+        )
+        try:
+            params = await asyncio.wait_for(reply, timeout=STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            raise
+        self.latencies.append(time.perf_counter() - t0)
+        return params
+
+    async def text(self, user_id: int, text: str, expect: str) -> dict:
+        return await self.step(user_id, text_update(user_id, text), expect)
+
+    async def press(self, user_id: int, data: str, expect: str) -> dict:
+        return await self.step(user_id, callback_update(user_id, data), expect)
+
+# --- Flujos ---
+async def registration(run: Runner, user_id: int):
+    await run.text(user_id, "/start", "Paciente o Especialista")
+    await run.text(user_id, "Paciente", "Menú de Paciente")
+    await run.text(user_id, "4. 👤 Mis datos", "nombre completo")
+    await run.text(user_id, f"Paciente {user_id}", "edad")
+    await run.text(user_id, "42", "sexo")
+    await run.text(user_id, "Femenino", "diagnóstico")
+    await run.text(user_id, "Lumbalgia", "dispositivo")
+    await run.text(user_id, f"lt-{user_id}", "Menú de Paciente")
+
+async def session(run: Runner, user_id: int):
+    await run.text(user_id, "1. ⚙️ Configurar sesión", "duración")
+    await run.text(user_id, "1. 10 minutos", "Menú de Paciente")
+
+async def alerts(run: Runner, user_id: int):
+    await run.text(user_id, "3. 🔔 Ajustar alertas", "mala postura")
+    await run.press(user_id, "alert:10", "Menú de Paciente")
+
+async def specialist(run: Runner, user_id: int):
+    await run.text(user_id, "/start", "Paciente o Especialista")
+    await run.text(user_id, "Especialista", "nombre completo")
+    await run.text(user_id, f"Especialista {user_id}", "edad")
+    await run.text(user_id, "45", "Menú de Especialista")
+    params = await run.text(user_id, "📋 Ver lista de pacientes", "Lista de pacientes")
+    # Siguiente página si el teclado la ofrece
+    markup = params.get("reply_markup")
+    markup = json.loads(markup) if isinstance(markup, str) else markup or {}
+    for row in markup.get("inline_keyboard", []):
+        for button in row:
+            if button.get("callback_data", "").startswith("patients:next:"):
+                await run.press(user_id, button["callback_data"], "Lista de pacientes")
+                return
+
+# --- Métricas del bot ---
+async def scrape(client: httpx.AsyncClient) -> dict:
+    response = await client.get(f"http://127.0.0.1:{METRICS_PORT}/metrics")
+    counts = {"db": 0.0, "redis": 0.0}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if sample.name == "shpd_db_query_seconds_count":
+                counts["db"] += sample.value
+            elif sample.name == "shpd_redis_command_seconds_count":
+                counts["redis"] += sample.value
+    return counts
+
+async def phase(name: str, flow, user_ids, client, api) -> dict:
+    run = Runner(client, api)
+    before = await scrape(client)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(flow(run, user_id) for user_id in user_ids), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    # Margen para que terminen escrituras diferidas (persistencia, ingesta) antes de medir
+    await asyncio.sleep(1)
+    after = await scrape(client)
+    updates = len(run.latencies) + run.errors
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    stats = {
+        "flujo": name,
+        "updates": updates,
+        "updates_s": len(run.latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(run.latencies, 0.50) * 1000 if run.latencies else 0.0,
+        "p95_ms": percentile(run.latencies, 0.95) * 1000 if run.latencies else 0.0,
+        "p99_ms": percentile(run.latencies, 0.99) * 1000 if run.latencies else 0.0,
+        "sql_update": (after["db"] - before["db"]) / updates if updates else 0.0,
+        "redis_update": (after["redis"] - before["redis"]) / updates if updates else 0.0,
+        "fallidos": failed,
+    }
+    print(
+        f"{name:<13} {stats['updates']:>7} {stats['updates_s']:>9,.0f} "
+        f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+        f"{stats['sql_update']:>7.2f} {stats['redis_update']:>7.2f} {failed:>6}"
+    )
+    return stats
+
+async def main() -> int:
+    prepare_database()
+    os.environ["METRICS_PORT"] = str(METRICS_PORT)
+    api = FakeBotAPI()
+    api.start(API_PORT)
+    bot = start_bot()
+    patients = [BASE_ID + i for i in range(USERS)]
+    specialists = [BASE_ID + USERS + i for i in range(SPECIALISTS)]
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), timeout=60)
+        limits = httpx.Limits(max_connections=200)
+        async with httpx.AsyncClient(limits=limits, timeout=STEP_TIMEOUT) as client:
+            print(f"{'flujo':<13} {'updates':>7} {'upd/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                  f"{'p99 ms':>8} {'sql/u':>7} {'redis/u':>7} {'fallos':>6}")
+            results = [
+                await phase("registro", registration, patients, client, api),
+                await phase("sesion", session, patients, client, api),
+                await phase("alertas", alerts, patients, client, api),
+                await phase("especialista", specialist, specialists, client, api),
+            ]
+    finally:
+        bot.terminate()
+        bot.wait()
+        api.stop()
+
+    if any(result["fallidos"] for result in results):
+        return 1
+    if MAX_P99_MS and any(result["p99_ms"] > MAX_P99_MS for result in results):
+        print(f"p99 por encima de {MAX_P99_MS:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
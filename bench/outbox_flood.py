@@ -0,0 +1,77 @@
+# Prueba de la cola de salida contra la Bot API falsa.
+#
+# Envía BENCH_MESSAGES mensajes repartidos entre BENCH_CHATS chats, más una
+# ráfaga de alertas, a través de un ExtBot con OutboxRateLimiter. La API falsa
+# responde 429 a una fracción de las llamadas. Comprueba que cada chat recibe
+# sus mensajes en orden, que no se supera el ritmo global y que las alertas
+# adelantan a los mensajes normales; informa profundidad de cola y latencias.
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from telegram.ext import ExtBot
+
+from fake_bot_api import FakeBotAPI
+from outbox import OutboxRateLimiter
+
+API_PORT = int(os.getenv("BENCH_API_PORT", "8082"))
+CHATS = int(os.getenv("BENCH_CHATS", "50"))
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "300"))
+GLOBAL_RATE = 30
+
+async def main():
+    api = FakeBotAPI()
+    rnd = random.Random(7)
+    api.rate_limit = lambda method, params: 1 if method == "sendMessage" and rnd.random() < 0.02 else None
+    api.start(API_PORT)
+
+    limiter = OutboxRateLimiter(global_rate=GLOBAL_RATE, chat_rate=1, chat_burst=3, max_queue=1000)
+    bot = ExtBot("1:bench", base_url=f"http://127.0.0.1:{API_PORT}/bot", rate_limiter=limiter)
+    await bot.initialize()
+
+    async def depth_probe(samples):
+        while True:
+            samples.append(limiter.depth)
+            await asyncio.sleep(0.1)
+
+    depths = []
+    probe = asyncio.create_task(depth_probe(depths))
+    t0 = time.perf_counter()
+    normal = [
+        bot.send_message(chat_id=1000 + i % CHATS, text=f"m{i // CHATS}")
+        for i in range(MESSAGES)
+    ]
+    alerts = [
+        bot.send_message(chat_id=9000 + i, text="alerta", rate_limit_args={"priority": "alert"})
+        for i in range(10)
+    ]
+    await asyncio.gather(*normal, *alerts)
+    elapsed = time.perf_counter() - t0
+    probe.cancel()
+
+    per_chat = {}
+    first_alert = last_normal = None
+    for ts, method, chat_id, params in api.sent:
+        if params["text"] == "alerta":
+            first_alert = first_alert or ts
+        else:
+            per_chat.setdefault(chat_id, []).append(int(params["text"][1:]))
+            last_normal = ts
+    in_order = all(seq == sorted(seq) for seq in per_chat.values())
+    sent = len(api.sent)
+
+    print(f"{sent} envíos en {elapsed:.1f} s -> {sent / elapsed:.1f} msg/s (límite {GLOBAL_RATE})")
+    print(f"orden por chat conservado: {in_order}")
+    print(f"alertas antes que el último normal: {first_alert is not None and first_alert < last_normal}")
+    print(f"429 simulados: {api.calls['sendMessage'] - sent}, reintentos: {limiter.retried}")
+    print(f"profundidad máx. de cola: {max(depths)}; {limiter.stats()}")
+
+    await bot.shutdown()
+    api.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
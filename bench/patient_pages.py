@@ -0,0 +1,73 @@
+# Benchmark de la lista paginada de pacientes con 100k pacientes sintéticos.
+#
+# Mide el tiempo de carga de páginas a distintas profundidades con paginación
+# keyset (page_pacientes) frente a OFFSET, que crece con la profundidad.
+# SQLite por defecto (requiere aiosqlite); DATABASE_URL para Postgres.
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import insert, select
+from models import Base, Paciente
+from db import engine, AsyncSessionLocal, page_pacientes
+
+PATIENTS = int(os.getenv("BENCH_PATIENTS", "100000"))
+PAGE_SIZE = int(os.getenv("BENCH_PAGE_SIZE", "10"))
+REPEAT = 50
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    rows = [
+        {
+            "telegram_id": str(i),
+            "device_id": f"dev-{i}",
+            "nombre": f"{rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}{rnd.randrange(10**6):06d} Apellido{i}",
+        }
+        for i in range(PATIENTS)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Paciente), rows)
+
+async def ordered_ids():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Paciente.id).order_by(Paciente.nombre, Paciente.id))
+        return result.scalars().all()
+
+async def time_keyset(cursor_id):
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        async with AsyncSessionLocal() as db:
+            await page_pacientes(db, PAGE_SIZE, after_id=cursor_id)
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+async def time_offset(offset):
+    # Mismas columnas que page_pacientes
+    stmt = select(Paciente.id, Paciente.nombre, Paciente.device_id).order_by(Paciente.nombre, Paciente.id)
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        async with AsyncSessionLocal() as db:
+            (await db.execute(stmt.offset(offset).limit(PAGE_SIZE + 1))).all()
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+async def main():
+    seed()
+    ids = await ordered_ids()
+    print(f"{PATIENTS} pacientes, páginas de {PAGE_SIZE}")
+    print(f"{'profundidad':>12} {'keyset ms':>10} {'offset ms':>10}")
+    for depth in (0, 0.25, 0.5, 0.75, 0.99):
+        position = int(len(ids) * depth)
+        keyset = await time_keyset(ids[position - 1] if position else None)
+        offset = await time_offset(position)
+        print(f"{depth:>12.0%} {keyset:>10.3f} {offset:>10.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
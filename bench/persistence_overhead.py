@@ -0,0 +1,64 @@
+# Coste por update de RedisPersistence frente a volcar el dict completo.
+#
+# Simula el registro de un paciente (una clave cambia por update) y mide el
+# tiempo de refresh + update incremental contra un SET del user_data entero.
+# Requiere un Redis local:
+#
+#   REDIS_HOST=localhost python bench/persistence_overhead.py
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from redis_client import r
+from persistence import RedisPersistence
+
+USERS = int(os.getenv("BENCH_USERS", "1000"))
+STEPS = [
+    ("rol", "paciente"),
+    ("state", "awaiting_patient_data"),
+    ("field_index", 1),
+    ("nombre", "Ana María Pérez"),
+    ("field_index", 2),
+    ("edad", 34),
+    ("field_index", 3),
+    ("sexo", "Femenino"),
+    ("field_index", 4),
+    ("diagnostico", "Cifosis postural leve"),
+    ("state", None),
+]
+
+async def incremental(persistence, user_id):
+    user_data = {}
+    for key, value in STEPS:
+        await persistence.refresh_user_data(user_id, user_data)
+        user_data[key] = value
+        await persistence.update_user_data(user_id, user_data)
+
+async def full_dump(user_id):
+    user_data = {}
+    for key, value in STEPS:
+        raw = await r.get(f"bench-full:{user_id}")
+        if raw:
+            user_data = json.loads(raw)
+        user_data[key] = value
+        await r.set(f"bench-full:{user_id}", json.dumps(user_data), ex=3600)
+
+async def run(name, coro_factory):
+    t0 = time.perf_counter()
+    await asyncio.gather(*(coro_factory(i) for i in range(USERS)))
+    elapsed = time.perf_counter() - t0
+    updates = USERS * len(STEPS)
+    print(f"{name:>12}: {elapsed / updates * 1e6:,.1f} µs/update ({updates / elapsed:,.0f} updates/s)")
+
+async def main():
+    persistence = RedisPersistence(r, ttl=3600)
+    await run("incremental", lambda i: incremental(persistence, 1_000_000 + i))
+    await run("dict entero", lambda i: full_dump(i))
+    await r.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
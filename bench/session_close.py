@@ -0,0 +1,64 @@
+# Cierre masivo de sesiones vencidas.
+#
+# Abre BENCH_SESSIONS sesiones que vencen a la vez y mide cuánto tarda el
+# planificador en cerrarlas todas (evento de cierre, mapeo del dispositivo y
+# aviso al paciente), y la memoria que ocupa el ZSET de plazos. Requiere un
+# Redis local; la base por defecto es SQLite (requiere aiosqlite).
+#
+#   REDIS_HOST=localhost python bench/session_close.py
+import asyncio
+import os
+import sys
+import time
+import uuid
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from models import Base
+from db import engine
+from redis_client import r
+from ingest import samples_stream
+from sessions import SESSION_DEADLINES, SessionScheduler, device_key, open_session
+
+SESSIONS = int(os.getenv("BENCH_SESSIONS", "20000"))
+
+class FakeBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    await r.delete(SESSION_DEADLINES)
+    start_ts = int(time.time()) - 60
+    async with r.pipeline(transaction=False) as pipe:
+        for i in range(SESSIONS):
+            pipe.delete(samples_stream(f"session-bench-{i}"))
+            await open_session(pipe, str(uuid.uuid4()), f"session-bench-{i}", str(200_000 + i), 30, start_ts)
+        await pipe.execute()
+    zset_bytes = await r.memory_usage(SESSION_DEADLINES)
+    print(f"{SESSIONS} sesiones abiertas, ZSET de plazos: {zset_bytes / 1024:.0f} KiB")
+
+    bot = FakeBot()
+    scheduler = SessionScheduler(bot)
+    t0 = time.perf_counter()
+    while await scheduler.run_once():
+        pass
+    await scheduler.stop()
+    elapsed = time.perf_counter() - t0
+    left = sum([await r.exists(device_key(f"session-bench-{i}")) for i in range(0, SESSIONS, 1000)])
+    print(f"cerradas {scheduler.closed} en {elapsed:.2f} s ({scheduler.closed / elapsed:.0f}/s), "
+          f"{bot.sent} avisos, mapeos restantes (muestra): {left}")
+
+    async with r.pipeline(transaction=False) as pipe:
+        for i in range(SESSIONS):
+            pipe.delete(samples_stream(f"session-bench-{i}"))
+        await pipe.execute()
+    await r.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+# Escalado del modo repartido (app/shards.py) con el número de workers.
+#
+# Para cada valor de BENCH_WORKERS arranca el proceso frontal en modo webhook
+# contra la Bot API falsa y repite el flujo de webhook_load.py ("/start" y
+# "Paciente" para BENCH_USERS usuarios concurrentes). "0" es el proceso único de
+# app/bot.py, como referencia. La Bot API falsa corre en este mismo proceso: si
+# se satura, el resultado lo refleja, así que conviene una máquina con más
+# núcleos que workers. SQLite por defecto (requiere aiosqlite).
+#
+#   BENCH_WORKERS=0,1,2,4 BENCH_USERS=2000 python bench/shards.py
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from fake_bot_api import FakeBotAPI
+from webhook_load import API_PORT, BOT, USERS, percentile, start_bot, user_flow
+
+SHARDS = os.path.join(os.path.dirname(__file__), "..", "app", "shards.py")
+WORKERS = [int(n) for n in os.getenv("BENCH_WORKERS", "0,1,2,4").split(",")]
+
+async def run(api: FakeBotAPI, workers: int) -> tuple:
+    api.webhook_set.clear()
+    if workers:
+        bot = start_bot(SHARDS, SHARD_WORKERS=str(workers))
+    else:
+        bot = start_bot(BOT)
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), timeout=60)
+        limits = httpx.Limits(max_connections=200)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            # Calentamiento: un usuario por worker, para no medir el arranque de los procesos
+            warmup = []
+            await asyncio.gather(*(user_flow(client, api, 1 + i, warmup) for i in range(max(workers, 1))))
+            latencies = []
+            t0 = time.perf_counter()
+            await asyncio.gather(*(user_flow(client, api, 10_000 + i, latencies) for i in range(USERS)))
+            elapsed = time.perf_counter() - t0
+    finally:
+        bot.terminate()
+        bot.wait()
+    return len(latencies) / elapsed, percentile(latencies, 0.50), percentile(latencies, 0.99)
+
+async def main():
+    api = FakeBotAPI()
+    api.start(API_PORT)
+    try:
+        print(f"{'workers':>7} {'upd/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        baseline = None
+        for workers in WORKERS:
+            rate, p50, p99 = await run(api, workers)
+            baseline = baseline or rate
+            print(f"{workers:>7} {rate:>9,.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}   x{rate / baseline:.2f}")
+    finally:
+        api.stop()
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,59 @@
+# Arranque en frío: tiempo de importación y hasta el primer update atendido.
+#
+# Mide (1) cuánto tarda en importarse app/bot.py en un proceso nuevo y (2) el
+# tiempo desde lanzar el bot en modo webhook contra la Bot API falsa hasta que
+# responde al primer "/start". SQLite por defecto (requiere aiosqlite).
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_bot_api import FakeBotAPI
+from webhook_load import API_PORT, WEBHOOK_PORT, SECRET, start_bot, text_update
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..", "app")
+RUNS = int(os.getenv("BENCH_RUNS", "5"))
+
+def import_time() -> float:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import bot"], cwd=APP_DIR, env=env, check=True)
+    return time.perf_counter() - t0
+
+async def first_update(api: FakeBotAPI) -> float:
+    api.webhook_set.clear()
+    t0 = time.perf_counter()
+    bot = start_bot()
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), timeout=60)
+        reply = api.wait_for(42)
+        async with httpx.AsyncClient() as client:
+            await client.post(
+                f"http://127.0.0.1:{WEBHOOK_PORT}/telegram",
+                json=text_update(42, "/start"),
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+        await asyncio.wait_for(reply, timeout=30)
+        return time.perf_counter() - t0
+    finally:
+        bot.terminate()
+        bot.wait()
+
+async def main():
+    imports = [import_time() for _ in range(RUNS)]
+    print(f"importar bot.py: min {min(imports) * 1000:.0f} ms, máx {max(imports) * 1000:.0f} ms")
+    api = FakeBotAPI()
+    api.start(API_PORT)
+    try:
+        starts = [await first_update(api) for _ in range(RUNS)]
+    finally:
+        api.stop()
+    print(f"arranque -> primer update: min {min(starts) * 1000:.0f} ms, máx {max(starts) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
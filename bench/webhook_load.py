@@ -0,0 +1,106 @@
+# Latencia y throughput del modo webhook con updates sintéticos.
+#
+# Levanta la Bot API falsa, arranca app/bot.py en modo webhook apuntando a
+# ella y envía por POST updates de N usuarios concurrentes ("/start" y luego
+# "Paciente"). La latencia se mide desde el POST hasta que el bot llama a
+# sendMessage para ese chat. Ninguno de los dos pasos toca Postgres.
+#
+#   BENCH_USERS=500 CONCURRENT_UPDATES=64 python bench/webhook_load.py
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_bot_api import FakeBotAPI
+
+API_PORT = int(os.getenv("BENCH_API_PORT", "8081"))
+WEBHOOK_PORT = int(os.getenv("BENCH_WEBHOOK_PORT", "8080"))
+USERS = int(os.getenv("BENCH_USERS", "500"))
+SECRET = "bench-secret"
+BOT = os.path.join(os.path.dirname(__file__), "..", "app", "bot.py")
+
+_update_ids = itertools.count(1)
+
+def text_update(user_id: int, text: str) -> dict:
+    update_id = next(_update_ids)
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+async def send(client, api, user_id, text, latencies):
+    reply = api.wait_for(user_id)
+    t0 = time.perf_counter()
+    await client.post(
+        f"http://127.0.0.1:{WEBHOOK_PORT}/telegram",
+        json=text_update(user_id, text),
+        headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+    )
+    await asyncio.wait_for(reply, timeout=30)
+    latencies.append(time.perf_counter() - t0)
+
+async def user_flow(client, api, user_id, latencies):
+    await send(client, api, user_id, "/start", latencies)
+    await send(client, api, user_id, "Paciente", latencies)
+
+def start_bot(script: str = BOT, **overrides) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        **overrides,
+        BOT_MODE="webhook",
+        TELEGRAM_TOKEN="1:bench",
+        TELEGRAM_BASE_URL=f"http://127.0.0.1:{API_PORT}/bot",
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=str(WEBHOOK_PORT),
+        WEBHOOK_URL=f"http://127.0.0.1:{WEBHOOK_PORT}",
+        WEBHOOK_SECRET=SECRET,
+    )
+    # Los usuarios simulados escriben más rápido que una persona: sin límite por usuario
+    env.setdefault("ADMISSION_RATE", "1000")
+    env.setdefault("ADMISSION_BURST", "1000")
+    # Sin Postgres local se usa SQLite (requiere aiosqlite)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    return subprocess.Popen([sys.executable, script], env=env)
+
+async def main():
+    api = FakeBotAPI()
+    api.start(API_PORT)
+    bot = start_bot()
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), timeout=60)
+        latencies = []
+        limits = httpx.Limits(max_connections=200)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(user_flow(client, api, 10_000 + i, latencies) for i in range(USERS)))
+            elapsed = time.perf_counter() - t0
+        print(f"{len(latencies)} updates en {elapsed:.2f} s -> {len(latencies) / elapsed:,.0f} updates/s")
+        print(
+            f"latencia ms: p50={percentile(latencies, 0.50) * 1000:.1f} "
+            f"p95={percentile(latencies, 0.95) * 1000:.1f} "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f} "
+            f"media={statistics.mean(latencies) * 1000:.1f}"
+        )
+    finally:
+        bot.terminate()
+        bot.wait()
+        api.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())